@@ -168,6 +168,8 @@ CREATE INDEX IF NOT EXISTS idx_unified_timestamp ON unified_realtime_historical_
 CREATE INDEX IF NOT EXISTS idx_unified_stop_id ON unified_realtime_historical_data(stop_id);
 CREATE INDEX IF NOT EXISTS idx_unified_trip_id ON unified_realtime_historical_data(trip_id);
 CREATE INDEX IF NOT EXISTS idx_unified_route_id ON unified_realtime_historical_data(route_id);
+-- Coalesced so vehicle-position rows, which have no stop_id, still deduplicate
+CREATE UNIQUE INDEX IF NOT EXISTS uq_unified_trip_stop_key ON unified_realtime_historical_data(COALESCE(trip_id, ''), COALESCE(stop_id, ''), timestamp);
 CREATE INDEX IF NOT EXISTS idx_feature_store_timestamp ON feature_store(timestamp);
 CREATE INDEX IF NOT EXISTS idx_feature_store_stop_id ON feature_store(stop_id);
 CREATE INDEX IF NOT EXISTS idx_model_predictions_timestamp ON model_predictions(timestamp);
@@ -0,0 +1,93 @@
+"""
+Shared Ingestion Helpers
+HTTP sessions and pooled database connections used across the ingestion modules
+"""
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+import requests
+from urllib3.util.retry import Retry
+from psycopg2.pool import ThreadedConnectionPool
+
+logger = logging.getLogger(__name__)
+
+# Advisory lock name held for a whole static GTFS load, by GTFSIngestor and
+# MARTAGTFSConnector alike, so overlapping runs never share staging tables
+GTFS_LOAD_LOCK_NAME = 'gtfs_static_load'
+
+# Rate limiting and transient upstream failures; anything else is returned as-is
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+def make_http_session(pool_connections: int = 8, pool_maxsize: int = 16, retries: int = 5,
+                      headers: Optional[Dict[str, str]] = None) -> requests.Session:
+    """Build a keep-alive session whose GETs are retried with exponential backoff
+
+    Retries honour Retry-After on 429/503 replies. ``retries=0`` disables them
+    entirely, so every response reaches the caller exactly as the server sent it.
+    """
+    session = requests.Session()
+    if headers:
+        session.headers.update(headers)
+    max_retries = Retry(
+        total=retries, backoff_factor=0.5, status_forcelist=RETRY_STATUSES,
+        allowed_methods=["GET"], respect_retry_after_header=True
+    ) if retries else 0
+    adapter = requests.adapters.HTTPAdapter(
+        pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=max_retries
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+class ConnectionPool:
+    """Thread-safe PostgreSQL connection pool, opened on first use"""
+
+    def __init__(self, minconn: int, maxconn: int, **connect_kwargs):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.connect_kwargs = connect_kwargs
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def _get_pool(self) -> ThreadedConnectionPool:
+        # Worker threads can race to first use; only one of them may open the pool
+        with self._pool_lock:
+            if self._pool is None:
+                try:
+                    self._pool = ThreadedConnectionPool(self.minconn, self.maxconn, **self.connect_kwargs)
+                    logger.info("Database connection pool established")
+                except Exception as e:
+                    logger.error(f"Failed to connect to database: {e}")
+                    raise
+            return self._pool
+
+    def getconn(self):
+        """Take a connection out of the pool; hand it back with ``putconn``"""
+        return self._get_pool().getconn()
+
+    def putconn(self, conn, close: bool = False):
+        """Return a connection, closing it instead of reusing it when ``close`` is set"""
+        self._get_pool().putconn(conn, close=close)
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection from the pool, rolling back anything left uncommitted"""
+        conn = self.getconn()
+        try:
+            yield conn
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            self.putconn(conn)
+
+    def closeall(self):
+        """Close every pooled connection; the pool reopens on next use"""
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.closeall()
+                self._pool = None
@@ -1,13 +1,19 @@
 import os
+import sys
 import logging
-import requests
 import pandas as pd
 import psycopg2
+from psycopg2 import extras
 from bs4 import BeautifulSoup
 from datetime import datetime, timedelta
 import re
 import json
 
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from src.data_ingestion.common import make_http_session
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -33,6 +39,11 @@ VENUES = {
     }
 }
 
+# Shared session for the venue sites, which expect a browser User-Agent
+HTTP_SESSION = make_http_session(headers={
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+})
+
 OUTPUT_CSV = "data/external/atlanta_events_data.csv"
 EVENTS_TABLE = "atlanta_events_data"
 
@@ -54,7 +65,8 @@ CREATE TABLE IF NOT EXISTS {EVENTS_TABLE} (
     venue_lat NUMERIC,
     venue_lon NUMERIC,
     estimated_attendance INTEGER,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (venue_name, event_name, event_date)
 );
 '''
 
@@ -72,10 +84,7 @@ def scrape_mercedes_benz_events():
     logging.info("Scraping Mercedes-Benz Stadium events")
     
     try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
-        response = requests.get(VENUES['mercedes_benz_stadium']['url'], headers=headers, timeout=15)
+        response = HTTP_SESSION.get(VENUES['mercedes_benz_stadium']['url'], timeout=15)
         response.raise_for_status()
         
         soup = BeautifulSoup(response.content, 'html.parser')
@@ -162,10 +171,7 @@ def scrape_state_farm_arena_events():
     logging.info("Scraping State Farm Arena events")
     
     try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
-        response = requests.get(VENUES['state_farm_arena']['url'], headers=headers, timeout=15)
+        response = HTTP_SESSION.get(VENUES['state_farm_arena']['url'], timeout=15)
         response.raise_for_status()
         
         soup = BeautifulSoup(response.content, 'html.parser')
@@ -289,33 +295,38 @@ def store_events_data(conn, events_data):
     if not events_data:
         return
     
+    # One row per conflict key (last one wins): a single upsert can't update the same row twice
+    rows = {
+        (event['venue_name'], event['event_name'], event['event_date']): (
+            event['venue_name'],
+            event['event_name'],
+            event['event_date'],
+            event['event_time'],
+            event['event_type'],
+            event['event_description'],
+            event['venue_lat'],
+            event['venue_lon'],
+            event['estimated_attendance']
+        )
+        for event in events_data
+    }
+    
     with conn.cursor() as cursor:
-        for event in events_data:
-            cursor.execute(f'''
-                INSERT INTO {EVENTS_TABLE} (
-                    venue_name, event_name, event_date, event_time, event_type,
-                    event_description, venue_lat, venue_lon, estimated_attendance
-                )
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-                ON CONFLICT (venue_name, event_name, event_date) DO UPDATE SET
-                    event_time = EXCLUDED.event_time,
-                    event_type = EXCLUDED.event_type,
-                    event_description = EXCLUDED.event_description,
-                    estimated_attendance = EXCLUDED.estimated_attendance,
-                    created_at = CURRENT_TIMESTAMP;
-            ''', (
-                event['venue_name'],
-                event['event_name'],
-                event['event_date'],
-                event['event_time'],
-                event['event_type'],
-                event['event_description'],
-                event['venue_lat'],
-                event['venue_lon'],
-                event['estimated_attendance']
-            ))
+        extras.execute_values(cursor, f'''
+            INSERT INTO {EVENTS_TABLE} (
+                venue_name, event_name, event_date, event_time, event_type,
+                event_description, venue_lat, venue_lon, estimated_attendance
+            )
+            VALUES %s
+            ON CONFLICT (venue_name, event_name, event_date) DO UPDATE SET
+                event_time = EXCLUDED.event_time,
+                event_type = EXCLUDED.event_type,
+                event_description = EXCLUDED.event_description,
+                estimated_attendance = EXCLUDED.estimated_attendance,
+                created_at = CURRENT_TIMESTAMP;
+        ''', list(rows.values()), page_size=500)
         conn.commit()
-        logging.info(f"Inserted/updated {len(events_data)} events.")
+        logging.info(f"Inserted/updated {len(rows)} events.")
 
 def save_to_csv(events_data):
     if not events_data:
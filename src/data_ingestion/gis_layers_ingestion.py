@@ -1,12 +1,16 @@
 import os
+import sys
 import logging
-import requests
-import fiona
 import psycopg2
-from shapely.geometry import shape, mapping
+from shapely.geometry import shape
 import json
 from datetime import datetime
 
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from src.data_ingestion.common import make_http_session
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -24,6 +28,9 @@ GIS_SOURCES = {
     }
 }
 
+# Shared session for the ARC open-data endpoints
+HTTP_SESSION = make_http_session()
+
 OUTPUT_DIR = "data/gis"
 GIS_TABLE = "marta_gis_layers"
 
@@ -57,7 +64,7 @@ def setup_gis_table(conn):
 
 def download_geojson(url, layer_name):
     logging.info(f"Downloading GeoJSON for {layer_name} from {url}")
-    response = requests.get(url, timeout=30)
+    response = HTTP_SESSION.get(url, timeout=30)
     response.raise_for_status()
     
     # Save raw GeoJSON
@@ -7,10 +7,11 @@ import os
 import sys
 import zipfile
 import io
+import csv
 import logging
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 import psycopg2
-from psycopg2 import extras
 from datetime import datetime, timedelta
 import numpy as np
 from typing import Dict, List, Optional
@@ -19,11 +20,22 @@ from typing import Dict, List, Optional
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
 
 from config.settings import settings
+from src.data_ingestion.common import ConnectionPool
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# GTFS files grouped so each group only references tables loaded by earlier groups
+GTFS_LOAD_WAVES = (
+    ("stops.txt", "routes.txt", "calendar.txt", "shapes.txt"),
+    ("trips.txt",),
+    ("stop_times.txt",),
+)
+
+# Files (each with its own connection) loaded concurrently within a wave
+GTFS_LOAD_WORKERS = 4
+
 
 class GTFSIngestion:
     """Handles GTFS static data ingestion"""
@@ -36,11 +48,14 @@ class GTFSIngestion:
             'password': settings.DB_PASSWORD,
             'port': settings.DB_PORT
         }
+        # Connections are pooled and reused across files and ingestion runs; see close()
+        self._pool = ConnectionPool(minconn=1, maxconn=GTFS_LOAD_WORKERS, **self.db_config)
         
-        # GTFS file configurations
+        # GTFS file configurations; files with a "key" are upserted on those columns, the rest are appended
         self.gtfs_files_config = {
             "stops.txt": {
                 "table": "gtfs_stops",
+                "key": ["stop_id"],
                 "columns": [
                     "stop_id", "stop_code", "stop_name", "stop_desc", "stop_lat", "stop_lon",
                     "zone_id", "stop_url", "location_type", "parent_station", "wheelchair_boarding",
@@ -49,6 +64,7 @@ class GTFSIngestion:
             },
             "routes.txt": {
                 "table": "gtfs_routes",
+                "key": ["route_id"],
                 "columns": [
                     "route_id", "agency_id", "route_short_name", "route_long_name", "route_desc",
                     "route_type", "route_url", "route_color", "route_text_color", "route_sort_order",
@@ -57,6 +73,7 @@ class GTFSIngestion:
             },
             "trips.txt": {
                 "table": "gtfs_trips",
+                "key": ["trip_id"],
                 "columns": [
                     "route_id", "service_id", "trip_id", "trip_short_name", "trip_headsign",
                     "direction_id", "block_id", "shape_id", "wheelchair_accessible", "bikes_allowed"
@@ -64,6 +81,7 @@ class GTFSIngestion:
             },
             "stop_times.txt": {
                 "table": "gtfs_stop_times",
+                "key": ["trip_id", "stop_sequence"],
                 "columns": [
                     "trip_id", "arrival_time", "departure_time", "stop_id", "stop_sequence",
                     "stop_headsign", "pickup_type", "drop_off_type", "shape_dist_traveled",
@@ -72,6 +90,7 @@ class GTFSIngestion:
             },
             "calendar.txt": {
                 "table": "gtfs_calendar",
+                "key": ["service_id"],
                 "columns": [
                     "service_id", "monday", "tuesday", "wednesday", "thursday", "friday",
                     "saturday", "sunday", "start_date", "end_date"
@@ -79,6 +98,7 @@ class GTFSIngestion:
             },
             "shapes.txt": {
                 "table": "gtfs_shapes",
+                "key": ["shape_id", "shape_pt_sequence"],
                 "columns": [
                     "shape_id", "shape_pt_lat", "shape_pt_lon", "shape_pt_sequence", "shape_dist_traveled"
                 ]
@@ -94,64 +114,105 @@ class GTFSIngestion:
             logger.error(f"Database connection failed: {e}")
             raise
     
-    def load_csv_to_db(self, conn, zip_file_obj, csv_filename, table_name, columns):
-        """Load CSV data from ZIP file into database table"""
+    def close(self):
+        """Close every pooled connection"""
+        self._pool.closeall()
+    
+    def load_csv_to_db(self, conn, zip_file_obj, csv_filename, table_name, columns, key=None):
+        """Load CSV data from ZIP file into database table via COPY
+        
+        Tables with a key (a list of primary key columns) are COPYed into a temporary staging
+        table and upserted on that key, so re-ingesting a feed replaces rows instead of failing;
+        the rest are COPYed straight into the target table.
+        """
         logger.info(f"Loading {csv_filename} into {table_name}...")
         
         try:
             with zip_file_obj.open(csv_filename) as f:
-                df = pd.read_csv(io.TextIOWrapper(f, encoding='utf-8'))
-                
-                # Ensure column names match database schema and handle missing columns
-                df = df.reindex(columns=columns, fill_value=None)
-                
-                # Convert DataFrame to list of tuples for psycopg2.extras.execute_values
-                data_to_insert = [tuple(row) for row in df.values]
+                header = next(csv.reader([f.readline().decode('utf-8-sig')]), [])
+                load_columns = [col for col in header if col in columns]
                 
-                if not data_to_insert:
+                if not load_columns:
                     logger.warning(f"No data to insert for {csv_filename}.")
                     return
                 
-                # Prepare the INSERT statement for execute_values
-                cols_str = ', '.join(columns)
-                # Find PK for ON CONFLICT (first column is always PK in our schema)
-                pk_col = columns[0]
-                update_str = ', '.join([f'{col} = EXCLUDED.{col}' for col in columns[1:]])
-                insert_query = f"""
-                    INSERT INTO {table_name} ({cols_str}) 
-                    VALUES %s 
-                    ON CONFLICT ({pk_col}) DO UPDATE SET {update_str};
-                """
+                if load_columns == header:
+                    # Every column is known: hand the rest of the zip member to COPY unchanged
+                    source = f
+                else:
+                    # Drop columns the schema doesn't have before COPY; parse only the kept ones,
+                    # as raw strings so no dtype inference runs and values reach COPY verbatim
+                    df = pd.read_csv(
+                        io.TextIOWrapper(f, encoding='utf-8'), header=None, names=header,
+                        usecols=load_columns, dtype=str, keep_default_na=False, engine='c'
+                    )
+                    source = io.StringIO(df[load_columns].to_csv(index=False, header=False))
                 
+                cols_str = ', '.join(load_columns)
                 with conn.cursor() as cursor:
-                    extras.execute_values(cursor, insert_query, data_to_insert, page_size=1000)
+                    if key:
+                        key_str = ', '.join(key)
+                        stage_table = f"stage_{table_name}"
+                        # stage_row records file order, so a repeated key keeps its last row
+                        cursor.execute(f"""
+                            CREATE TEMP TABLE IF NOT EXISTS {stage_table}
+                            (LIKE {table_name} INCLUDING DEFAULTS, stage_row BIGSERIAL)
+                            ON COMMIT DELETE ROWS
+                        """)
+                        cursor.copy_expert(f"COPY {stage_table} ({cols_str}) FROM STDIN WITH CSV", source)
+                        update_str = ', '.join(
+                            f'{col} = EXCLUDED.{col}' for col in load_columns if col not in key
+                        )
+                        conflict_action = f"DO UPDATE SET {update_str}" if update_str else "DO NOTHING"
+                        # DISTINCT ON keeps one row per key so the upsert can't touch a row twice
+                        cursor.execute(f"""
+                            INSERT INTO {table_name} ({cols_str})
+                            SELECT DISTINCT ON ({key_str}) {cols_str} FROM {stage_table}
+                            ORDER BY {key_str}, stage_row DESC
+                            ON CONFLICT ({key_str}) {conflict_action}
+                        """)
+                    else:
+                        cursor.copy_expert(f"COPY {table_name} ({cols_str}) FROM STDIN WITH CSV", source)
+                    loaded = cursor.rowcount
                     conn.commit()
-                    logger.info(f"Successfully loaded {len(data_to_insert)} rows into {table_name}.")
+                    logger.info(f"Successfully loaded {loaded} rows into {table_name}.")
                     
         except Exception as e:
             conn.rollback()
             logger.error(f"Error loading {csv_filename}: {e}")
             raise
     
+    def _load_gtfs_file(self, gtfs_zip_path: str, gtfs_file: str):
+        """Load one GTFS file on its own pooled connection and ZipFile handle (safe to run in a thread)"""
+        config = self.gtfs_files_config[gtfs_file]
+        with self._pool.connection() as conn, zipfile.ZipFile(gtfs_zip_path, 'r') as zf:
+            self.load_csv_to_db(
+                conn, zf, gtfs_file, config["table"], config["columns"], config.get("key")
+            )
+    
     def ingest_gtfs_static(self, gtfs_zip_path: str):
         """Ingest GTFS static data from ZIP file"""
-        conn = None
         try:
-            conn = self.create_db_connection()
-            
             with zipfile.ZipFile(gtfs_zip_path, 'r') as zf:
-                for gtfs_file, config in self.gtfs_files_config.items():
-                    if gtfs_file in zf.namelist():
-                        self.load_csv_to_db(conn, zf, gtfs_file, config["table"], config["columns"])
-                    else:
-                        logger.warning(f"Warning: {gtfs_file} not found in zip file.")
+                members = set(zf.namelist())
+            for gtfs_file in self.gtfs_files_config:
+                if gtfs_file not in members:
+                    logger.warning(f"Warning: {gtfs_file} not found in zip file.")
+            
+            # Files within a wave are independent and load in parallel; waves run in
+            # foreign-key order so trips and stop_times always find their parent rows
+            with ThreadPoolExecutor(max_workers=GTFS_LOAD_WORKERS) as executor:
+                for wave in GTFS_LOAD_WAVES:
+                    futures = [
+                        executor.submit(self._load_gtfs_file, gtfs_zip_path, gtfs_file)
+                        for gtfs_file in wave if gtfs_file in members
+                    ]
+                    for future in futures:
+                        future.result()
                         
         except Exception as e:
             logger.error(f"An error occurred during GTFS static ingestion: {e}")
             raise
-        finally:
-            if conn:
-                conn.close()
     
     def create_demo_gtfs_data(self, output_path: str = "data/static/demo_gtfs.zip"):
         """Create demo GTFS data for testing"""
@@ -314,7 +375,10 @@ def main():
     create_demo = args.create_demo and not args.no_demo
     
     ingestor = GTFSIngestion()
-    ingestor.run_ingestion(gtfs_zip_path=args.gtfs_zip, create_demo=create_demo)
+    try:
+        ingestor.run_ingestion(gtfs_zip_path=args.gtfs_zip, create_demo=create_demo)
+    finally:
+        ingestor.close()
 
 
 if __name__ == "__main__":
@@ -7,7 +7,8 @@ import sys
 import zipfile
 import io
 import logging
-from typing import Dict, List, Optional
+from concurrent.futures import ProcessPoolExecutor
+from typing import BinaryIO, Dict, List, Optional, Union
 import pandas as pd
 import psycopg2
 from psycopg2 import extras
@@ -31,14 +32,77 @@ except ImportError:
         'RAW_DATA_DIR': os.getenv('RAW_DATA_DIR', 'data/raw')
     })()
 
+from src.data_ingestion.common import GTFS_LOAD_LOCK_NAME
+
 logger = logging.getLogger(__name__)
 
+# Rows parsed per chunk on the serial load path, bounding memory for large members
+CSV_CHUNK_ROWS = 50_000
+
+
+def _connection_params() -> Dict:
+    """Connection keyword arguments shared by the ingestor and its workers"""
+    return {
+        'host': settings.DB_HOST,
+        'database': settings.DB_NAME,
+        'user': settings.DB_USER,
+        'password': settings.DB_PASSWORD,
+        'port': settings.DB_PORT,
+        # Probe idle sockets so a long stop_times parse doesn't find the connection dropped by NAT
+        'keepalives': 1,
+        'keepalives_idle': 30,
+        'keepalives_interval': 10,
+        'keepalives_count': 5
+    }
+
+
+def _stage_gtfs_member(csv_filename: str, payload: bytes, config: Dict) -> int:
+    """Parse one GTFS member and COPY it into its staging table.
+
+    Runs in a worker process with its own connection, so it must only use
+    module-level state.
+    """
+    table_name = config["table"]
+    columns = config["columns"]
+    staging_table = f"{table_name}_staging"
+
+    # Keep the raw text so COPY does the type conversion server-side, and skip parsing
+    # any columns the table doesn't have
+    wanted = set(columns)
+    df = pd.read_csv(io.BytesIO(payload), dtype=str, usecols=lambda col: col in wanted, engine='c')
+    df = df.reindex(columns=columns)
+    buffer = io.StringIO()
+    df.to_csv(buffer, index=False, header=False)
+    buffer.seek(0)
+
+    conn = psycopg2.connect(**_connection_params())
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                f"CREATE UNLOGGED TABLE IF NOT EXISTS {staging_table} "
+                f"(LIKE {table_name} INCLUDING DEFAULTS)"
+            )
+            # File order, so the merge keeps the last row of a repeated key like the serial path;
+            # added separately so staging tables left by older runs pick it up too
+            cursor.execute(f"ALTER TABLE {staging_table} ADD COLUMN IF NOT EXISTS stage_row BIGSERIAL")
+            cursor.execute(f"TRUNCATE {staging_table}")
+            cursor.copy_expert(
+                f"COPY {staging_table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+                buffer
+            )
+        conn.commit()
+    finally:
+        conn.close()
+
+    return len(df)
+
 
 class GTFSIngestor:
     """Handles GTFS static data ingestion from MARTA"""
     
-    def __init__(self):
+    def __init__(self, max_workers: int = 4):
         self.db_connection = None
+        self.max_workers = max_workers
         self.gtfs_data_path = os.path.join(settings.RAW_DATA_DIR, "gtfs_static")
         os.makedirs(self.gtfs_data_path, exist_ok=True)
         
@@ -95,20 +159,46 @@ class GTFSIngestor:
                 "primary_key": ["shape_id", "shape_pt_sequence"]
             }
         }
+
+        # The config is static, so build the upsert statements once
+        for config in self.gtfs_files_config.values():
+            config.update(self._build_upsert_sql(config))
+
+    @staticmethod
+    def _build_upsert_sql(config: Dict) -> Dict[str, str]:
+        """Build the execute_values insert and staging merge statements for a table"""
+        table_name = config["table"]
+        columns = config["columns"]
+        cols_str = ', '.join(columns)
+        conflict_cols = ', '.join(config["primary_key"])
+        update_str = ', '.join(
+            f"{col} = EXCLUDED.{col}" for col in columns if col not in config["primary_key"]
+        )
+
+        insert_sql = f"""
+            INSERT INTO {table_name} ({cols_str}) 
+            VALUES %s 
+            ON CONFLICT ({conflict_cols}) 
+            DO UPDATE SET {update_str}
+        """
+        # DISTINCT ON guards against duplicate keys inside a single feed file; ordering by
+        # the staged row number keeps the file's last row, as drop_duplicates(keep='last') does
+        merge_sql = f"""
+            INSERT INTO {table_name} ({cols_str})
+            SELECT DISTINCT ON ({conflict_cols}) {cols_str} FROM {table_name}_staging
+            ORDER BY {conflict_cols}, stage_row DESC
+            ON CONFLICT ({conflict_cols})
+            DO UPDATE SET {update_str}
+        """
+        return {"insert_sql": insert_sql, "merge_sql": merge_sql}
     
     def create_db_connection(self):
         """Create database connection"""
         try:
-            self.db_connection = psycopg2.connect(
-                host=settings.DB_HOST,
-                database=settings.DB_NAME,
-                user=settings.DB_USER,
-                password=settings.DB_PASSWORD,
-                port=settings.DB_PORT
-            )
+            self.db_connection = psycopg2.connect(**_connection_params())
             logger.info("Database connection established")
         except Exception as e:
-            logger.error(f"Failed to connect to database: {e}")
+            logger.error("Failed to connect to database: %s", e)
             raise
     
     def create_tables(self):
@@ -208,9 +298,9 @@ class GTFSIngestor:
             for table_name, sql in create_tables_sql.items():
                 try:
                     cursor.execute(sql)
-                    logger.info(f"Created table: {table_name}")
+                    logger.info("Created table: %s", table_name)
                 except Exception as e:
-                    logger.warning(f"Table {table_name} may already exist: {e}")
+                    logger.warning("Table %s may already exist: %s", table_name, e)
         
         self.db_connection.commit()
     
@@ -222,158 +312,231 @@ class GTFSIngestor:
             gtfs_zip_path = os.path.join(self.gtfs_data_path, "gtfs_static.zip")
             
             if os.path.exists(gtfs_zip_path):
-                logger.info(f"GTFS data found at: {gtfs_zip_path}")
+                logger.info("GTFS data found at: %s", gtfs_zip_path)
                 return gtfs_zip_path
             else:
-                logger.warning(f"GTFS data not found at: {gtfs_zip_path}")
+                logger.warning("GTFS data not found at: %s", gtfs_zip_path)
                 logger.info("Please manually download GTFS data from MARTA Developer Portal")
                 return None
                 
         except Exception as e:
-            logger.error(f"Failed to download GTFS data: {e}")
+            logger.error("Failed to download GTFS data: %s", e)
             return None
     
+    @staticmethod
+    def _prepare_rows(df: pd.DataFrame, csv_filename: str, config: Dict) -> pd.DataFrame:
+        """Coerce one parsed chunk of a GTFS file into the table's column order and types"""
+        # Ensure column names match database schema
+        df = df.reindex(columns=config["columns"], fill_value=None)
+
+        # Handle specific data type conversions for stops.txt
+        if csv_filename == "stops.txt":
+            # Convert to nullable integer type, then replace NaN with None
+            for col in ["location_type", "wheelchair_boarding"]:
+                if col in df.columns:
+                    df[col] = df[col].apply(lambda x: int(x) if pd.notna(x) else None)
+        
+        # Handle specific data type conversions for routes.txt
+        if csv_filename == "routes.txt":
+            for col in ["route_type", "route_sort_order", "continuous_pickup", "continuous_dropoff"]:
+                if col in df.columns:
+                    df[col] = df[col].apply(lambda x: int(x) if pd.notna(x) else None)
+
+        # Handle specific data type conversions for calendar.txt
+        if csv_filename == "calendar.txt":
+            for col in ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]:
+                if col in df.columns:
+                    df[col] = df[col].apply(lambda x: bool(int(x)) if x is not None else None)
+            for col in ["start_date", "end_date"]:
+                if col in df.columns:
+                    df[col] = df[col].apply(lambda x: pd.to_datetime(str(int(x)), format='%Y%m%d').date() if x is not None else None)
+
+        # General cleanup: replace NaN with None and ensure native Python types
+        df = df.where(pd.notnull(df), None)
+        df = df.astype(object)
+
+        # A key repeated within one statement would make the upsert touch a row twice
+        return df.drop_duplicates(subset=config["primary_key"], keep='last')
+    
     def load_csv_to_db(self, zip_file_obj, csv_filename: str, config: Dict):
-        """Load CSV data from zip file into database table"""
+        """Load CSV data from zip file into database table, one bounded chunk at a time
+
+        The rows are left uncommitted; ``ingest_gtfs_static`` commits the whole feed at once.
+        """
         table_name = config["table"]
-        columns = config["columns"]
-        logger.info(f"Loading {csv_filename} into {table_name}...")
+        logger.info("Loading %s into %s...", csv_filename, table_name)
         
         try:
-            with zip_file_obj.open(csv_filename) as f:
-                df = pd.read_csv(io.TextIOWrapper(f, encoding='utf-8'))
-                
-                # Ensure column names match database schema
-                df = df.reindex(columns=columns, fill_value=None)
-
-                # Handle specific data type conversions for stops.txt
-                if csv_filename == "stops.txt":
-                    # Convert to nullable integer type, then replace NaN with None
-                    for col in ["location_type", "wheelchair_boarding"]:
-                        if col in df.columns:
-                            df[col] = df[col].apply(lambda x: int(x) if pd.notna(x) else None)
-                
-                # Handle specific data type conversions for routes.txt
-                if csv_filename == "routes.txt":
-                    for col in ["route_type", "route_sort_order", "continuous_pickup", "continuous_dropoff"]:
-                        if col in df.columns:
-                            df[col] = df[col].apply(lambda x: int(x) if pd.notna(x) else None)
-
-                # Handle specific data type conversions for calendar.txt
-                if csv_filename == "calendar.txt":
-                    for col in ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]:
-                        if col in df.columns:
-                            df[col] = df[col].apply(lambda x: bool(int(x)) if x is not None else None)
-                    for col in ["start_date", "end_date"]:
-                        if col in df.columns:
-                            df[col] = df[col].apply(lambda x: pd.to_datetime(str(int(x)), format='%Y%m%d').date() if x is not None else None)
-
-                # General cleanup: replace NaN with None and ensure native Python types
-                df = df.where(pd.notnull(df), None)
-                df = df.astype(object)
-
-                # Convert DataFrame to list of tuples
-                data_to_insert = [tuple(row) for row in df.values]
-                
-                if not data_to_insert:
-                    logger.warning(f"No data to insert for {csv_filename}")
-                    return
-                
-                # Prepare INSERT statement with upsert capability
-                cols_str = ', '.join(columns)
-                vals_str = ', '.join(['%s' for _ in columns])
-                
-                # Use ON CONFLICT for upsert (PostgreSQL specific)
-                table_name = config["table"]
-                columns = config["columns"]
-                conflict_cols = config["primary_key"]
-                update_cols = [f"{col} = EXCLUDED.{col}" for col in columns[1:]]
-                
-                insert_query = f"""
-                    INSERT INTO {table_name} ({cols_str}) 
-                    VALUES %s 
-                    ON CONFLICT ({', '.join(conflict_cols)}) 
-                    DO UPDATE SET {', '.join(update_cols)}
-                """
-                
-                with self.db_connection.cursor() as cursor:
-                    extras.execute_values(cursor, insert_query, data_to_insert, page_size=1000)
-                    self.db_connection.commit()
-                    
-                logger.info(f"Successfully loaded {len(data_to_insert)} rows into {table_name}")
+            loaded = 0
+            with zip_file_obj.open(csv_filename) as raw, \
+                    io.TextIOWrapper(raw, encoding='utf-8', newline='') as f, \
+                    self.db_connection.cursor() as cursor:
+                for chunk in pd.read_csv(f, chunksize=CSV_CHUNK_ROWS):
+                    df = self._prepare_rows(chunk, csv_filename, config)
+                    if df.empty:
+                        continue
+                    # Rows are ordered like config["columns"] by the reindex in _prepare_rows
+                    extras.execute_values(
+                        cursor, config["insert_sql"], df.itertuples(index=False, name=None), page_size=1000
+                    )
+                    loaded += len(df)
+            
+            if not loaded:
+                logger.warning("No data to insert for %s", csv_filename)
+                return
+            
+            logger.info("Successfully loaded %d rows into %s", loaded, table_name)
                 
         except Exception as e:
-            self.db_connection.rollback()
-            logger.error(f"Error loading {csv_filename}: {e}")
+            logger.error("Error loading %s: %s", csv_filename, e)
             raise
     
-    def ingest_gtfs_static(self, gtfs_zip_path: str):
-        """Main method to ingest GTFS static data"""
+    def merge_staging_table(self, config: Dict) -> None:
+        """Upsert a staging table filled by a worker into its target table"""
+        staging_table = f"{config['table']}_staging"
+
+        with self.db_connection.cursor() as cursor:
+            cursor.execute(config["merge_sql"])
+            merged = cursor.rowcount
+            cursor.execute(f"TRUNCATE {staging_table}")
+        logger.info("Merged %s rows from %s into %s", merged, staging_table, config['table'])
+
+    def _ingest_parallel(self, zf: zipfile.ZipFile, gtfs_files: List[str]) -> None:
+        """Stage GTFS members concurrently, then merge them in dependency order"""
+        with ProcessPoolExecutor(max_workers=min(self.max_workers, len(gtfs_files))) as executor:
+            # Members are read in the parent; workers only receive plain bytes
+            futures = {
+                gtfs_file: executor.submit(
+                    _stage_gtfs_member, gtfs_file, zf.read(gtfs_file),
+                    self.gtfs_files_config[gtfs_file]
+                )
+                for gtfs_file in gtfs_files
+            }
+            for gtfs_file, future in futures.items():
+                rows = future.result()
+                logger.info("Staged %s rows from %s", rows, gtfs_file)
+
+        # Merge order follows gtfs_files_config so parents land before children
+        for gtfs_file in gtfs_files:
+            self.merge_staging_table(self.gtfs_files_config[gtfs_file])
+
+    def ingest_gtfs_static(self, gtfs_zip_path: Union[str, BinaryIO], validate: bool = False) -> Optional[Dict[str, bool]]:
+        """Main method to ingest GTFS static data
+
+        ``gtfs_zip_path`` may also be a seekable binary file object holding
+        the archive, such as a download that was never written to disk.
+        When ``validate`` is set, the validation queries run on the ingest
+        connection and their results are returned.
+        """
+        validation_results = None
         try:
             # Create database connection and tables
             self.create_db_connection()
             self.create_tables()
             
             with zipfile.ZipFile(gtfs_zip_path, 'r') as zf:
-                for gtfs_file, config in self.gtfs_files_config.items():
-                    if gtfs_file in zf.namelist():
-                        self.load_csv_to_db(zf, gtfs_file, config)
+                available = set(zf.namelist())
+                gtfs_files = []
+                for gtfs_file in self.gtfs_files_config:
+                    if gtfs_file in available:
+                        gtfs_files.append(gtfs_file)
+                    else:
+                        logger.warning("File %s not found in GTFS zip", gtfs_file)
+
+                # Overlapping runs would truncate each other's staging tables, so wait
+                # for any other load to finish before staging anything
+                with self.db_connection.cursor() as cursor:
+                    cursor.execute("SELECT pg_advisory_lock(hashtext(%s))", (GTFS_LOAD_LOCK_NAME,))
+
+                # The whole feed is one transaction: a single commit, and a failed
+                # file rolls back every table instead of leaving a partial load
+                try:
+                    if self.max_workers > 1 and len(gtfs_files) > 1:
+                        self._ingest_parallel(zf, gtfs_files)
                     else:
-                        logger.warning(f"File {gtfs_file} not found in GTFS zip")
+                        for gtfs_file in gtfs_files:
+                            self.load_csv_to_db(zf, gtfs_file, self.gtfs_files_config[gtfs_file])
+
+                    # Refresh planner statistics so the validation joins use fresh row counts
+                    with self.db_connection.cursor() as cursor:
+                        for gtfs_file in gtfs_files:
+                            cursor.execute(f"ANALYZE {self.gtfs_files_config[gtfs_file]['table']}")
+                    self.db_connection.commit()
+                except Exception:
+                    self.db_connection.rollback()
+                    raise
+                finally:
+                    # Session-level locks outlive a rollback, so release explicitly
+                    with self.db_connection.cursor() as cursor:
+                        cursor.execute("SELECT pg_advisory_unlock(hashtext(%s))", (GTFS_LOAD_LOCK_NAME,))
+                    self.db_connection.commit()
             
             logger.info("GTFS static data ingestion completed successfully")
+
+            if validate:
+                validation_results = self.validate_gtfs_data()
             
         except Exception as e:
-            logger.error(f"GTFS ingestion failed: {e}")
+            logger.error("GTFS ingestion failed: %s", e)
             raise
         finally:
             if self.db_connection:
                 self.db_connection.close()
+
+        return validation_results
     
     def validate_gtfs_data(self) -> Dict[str, bool]:
         """Validate GTFS data quality"""
         validation_results = {}
+        owns_connection = not self.db_connection or self.db_connection.closed
+        
+        # All checks are gathered in a single round trip
+        has_data_checks = [
+            f"EXISTS (SELECT 1 FROM {config['table']})"
+            for config in self.gtfs_files_config.values()
+        ]
+        validation_query = f"""
+            WITH orphan_trips AS (
+                SELECT COUNT(*) AS n FROM gtfs_trips t 
+                LEFT JOIN gtfs_routes r ON t.route_id = r.route_id 
+                WHERE r.route_id IS NULL
+            ),
+            orphan_stop_times AS (
+                SELECT COUNT(*) AS n FROM gtfs_stop_times st 
+                LEFT JOIN gtfs_trips t ON st.trip_id = t.trip_id 
+                LEFT JOIN gtfs_stops s ON st.stop_id = s.stop_id 
+                WHERE t.trip_id IS NULL OR s.stop_id IS NULL
+            )
+            SELECT {', '.join(has_data_checks)},
+                (SELECT n FROM orphan_trips),
+                (SELECT n FROM orphan_stop_times)
+        """
         
         try:
-            self.create_db_connection()
+            if owns_connection:
+                self.create_db_connection()
+            
+            with self.db_connection.cursor() as cursor:
+                cursor.execute(validation_query)
+                row = cursor.fetchone()
             
             # Check for required files
-            for table_name in self.gtfs_files_config.keys():
-                table_name_clean = table_name.replace('.txt', '')
-                with self.db_connection.cursor() as cursor:
-                    cursor.execute(f"SELECT COUNT(*) FROM {table_name_clean}")
-                    count = cursor.fetchone()[0]
-                    validation_results[f"{table_name}_has_data"] = count > 0
+            for gtfs_file, has_data in zip(self.gtfs_files_config, row):
+                validation_results[f"{gtfs_file}_has_data"] = has_data
             
             # Check referential integrity
-            with self.db_connection.cursor() as cursor:
-                # Check if trips reference valid routes
-                cursor.execute("""
-                    SELECT COUNT(*) FROM gtfs_trips t 
-                    LEFT JOIN gtfs_routes r ON t.route_id = r.route_id 
-                    WHERE r.route_id IS NULL
-                """)
-                orphan_trips = cursor.fetchone()[0]
-                validation_results["referential_integrity_trips_routes"] = orphan_trips == 0
-                
-                # Check if stop_times reference valid trips and stops
-                cursor.execute("""
-                    SELECT COUNT(*) FROM gtfs_stop_times st 
-                    LEFT JOIN gtfs_trips t ON st.trip_id = t.trip_id 
-                    LEFT JOIN gtfs_stops s ON st.stop_id = s.stop_id 
-                    WHERE t.trip_id IS NULL OR s.stop_id IS NULL
-                """)
-                orphan_stop_times = cursor.fetchone()[0]
-                validation_results["referential_integrity_stop_times"] = orphan_stop_times == 0
+            orphan_trips, orphan_stop_times = row[-2:]
+            validation_results["referential_integrity_trips_routes"] = orphan_trips == 0
+            validation_results["referential_integrity_stop_times"] = orphan_stop_times == 0
             
             logger.info("GTFS data validation completed")
             
         except Exception as e:
-            logger.error(f"GTFS validation failed: {e}")
+            logger.error("GTFS validation failed: %s", e)
             validation_results["validation_error"] = False
         
         finally:
-            if self.db_connection:
+            if owns_connection and self.db_connection:
                 self.db_connection.close()
         
         return validation_results
@@ -389,12 +552,9 @@ def main():
     gtfs_zip_path = ingestor.download_gtfs_data()
     
     if gtfs_zip_path:
-        # Ingest GTFS data
-        ingestor.ingest_gtfs_static(gtfs_zip_path)
-        
-        # Validate ingested data
-        validation_results = ingestor.validate_gtfs_data()
-        logger.info(f"Validation results: {validation_results}")
+        # Ingest and validate GTFS data over the same connection
+        validation_results = ingestor.ingest_gtfs_static(gtfs_zip_path, validate=True)
+        logger.info("Validation results: %s", validation_results)
     else:
         logger.error("GTFS data not available for ingestion")
 
@@ -1,21 +1,36 @@
 import os
-import time
+import sys
+import asyncio
 import logging
 import psycopg2
-import requests
-from datetime import datetime
-from google.transit import gtfs_realtime_pb2
+from psycopg2 import extras
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+from src.data_ingestion.gtfs_rt_common import VEHICLE_STOP_STATUS_NAMES, gtfs_realtime_pb2
+from src.data_ingestion.common import make_http_session
+
 # MARTA GTFS-RT API Endpoints
 VEHICLE_POSITIONS_URL = "https://api.marta.io/gtfs-rt/vehicle-positions/vehicle.pb"
 TRIP_UPDATES_URL = "https://api.marta.io/gtfs-rt/trip-updates/tripupdate.pb"
 
 # API Key (set as environment variable)
 API_KEY = os.getenv("MARTA_API_KEY", "YOUR_MARTA_API_KEY")
-HEADERS = {"x-api-key": API_KEY}
+# Ask for a compressed protobuf body; requests decodes it transparently
+HEADERS = {"x-api-key": API_KEY, "Accept": "application/x-protobuf", "Accept-Encoding": "gzip, deflate"}
+
+# Shared HTTP session so both feeds reuse one kept-alive TLS connection per host.
+# Few retries: a feed that stays down is simply picked up again on the next poll
+SESSION = make_http_session(pool_connections=1, pool_maxsize=4, retries=2, headers=HEADERS)
+
+# The two feeds are independent, so each poll fetches them side by side
+FETCH_EXECUTOR = ThreadPoolExecutor(max_workers=2)
 
 # Database connection details (set as environment variables)
 DB_HOST = os.getenv("DB_HOST", "localhost")
@@ -40,7 +55,7 @@ CREATE TABLE IF NOT EXISTS {VEHICLE_POSITIONS_TABLE} (
     speed NUMERIC,
     timestamp TIMESTAMP,
     current_status TEXT
-);
+) PARTITION BY RANGE (timestamp);
 '''
 
 CREATE_TRIP_UPDATES_TABLE = f'''
@@ -58,135 +73,216 @@ CREATE TABLE IF NOT EXISTS {TRIP_UPDATES_TABLE} (
     arrival_time TIMESTAMP,
     departure_delay INTEGER,
     departure_time TIMESTAMP
-);
+) PARTITION BY RANGE (timestamp);
+'''
+
+# Both realtime tables are append-only time series, partitioned by day
+PARTITIONED_TABLES = (VEHICLE_POSITIONS_TABLE, TRIP_UPDATES_TABLE)
+
+# Multi-row inserts; column order matches the rows built by process_* below
+INSERT_VEHICLE_POSITIONS = f'''
+INSERT INTO {VEHICLE_POSITIONS_TABLE} (id, trip_id, route_id, vehicle_id, latitude, longitude, bearing, speed, timestamp, current_status)
+VALUES %s
+'''
+
+INSERT_TRIP_UPDATES = f'''
+INSERT INTO {TRIP_UPDATES_TABLE} (id, trip_id, route_id, direction_id, start_time, start_date, timestamp, stop_id, stop_sequence, arrival_delay, arrival_time, departure_delay, departure_time)
+VALUES %s
 '''
 
+INSERT_PAGE_SIZE = 500
+
 def create_db_connection():
     return psycopg2.connect(host=DB_HOST, database=DB_NAME, user=DB_USER, password=DB_PASSWORD)
 
+def migrate_unpartitioned_table(cursor, table, create_sql):
+    """Rebuild a plain table created before partitioning as a partitioned one"""
+    cursor.execute("SELECT to_regclass(%s) IS NOT NULL", (table,))
+    if not cursor.fetchone()[0]:
+        return
+    cursor.execute(
+        "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)", (table,)
+    )
+    if cursor.fetchone():
+        return
+    logging.info("Migrating %s to a partitioned table...", table)
+    cursor.execute(f"ALTER TABLE {table} RENAME TO {table}_unpartitioned")
+    cursor.execute(create_sql)
+    cursor.execute(f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT")
+    # Existing rows go to the default partition; ensure_daily_partitions moves
+    # the recent days out again as it creates their partitions
+    cursor.execute(f"INSERT INTO {table} SELECT * FROM {table}_unpartitioned")
+    logging.info("Copied %d existing rows into partitioned %s.", cursor.rowcount, table)
+    cursor.execute(f"DROP TABLE {table}_unpartitioned")
+
 def setup_tables(conn):
     with conn.cursor() as cursor:
+        migrate_unpartitioned_table(cursor, VEHICLE_POSITIONS_TABLE, CREATE_VEHICLE_POSITIONS_TABLE)
+        migrate_unpartitioned_table(cursor, TRIP_UPDATES_TABLE, CREATE_TRIP_UPDATES_TABLE)
         cursor.execute(CREATE_VEHICLE_POSITIONS_TABLE)
         cursor.execute(CREATE_TRIP_UPDATES_TABLE)
+        for table in PARTITIONED_TABLES:
+            # Rows with a missing or far-off timestamp land in the default partition
+            cursor.execute(f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT")
+            # BRIN suits insert-ordered timestamps and is far cheaper to maintain than a btree
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_timestamp_brin ON {table} USING BRIN (timestamp)")
         conn.commit()
         logging.info("Ensured GTFS-RT tables exist.")
 
+def ensure_daily_partitions(conn, day):
+    """Create the partitions covering the day before, of and after ``day``
+
+    Rows for a new day may already sit in the default partition (inserted before
+    the partition existed, or stamped ahead of tomorrow), and Postgres refuses to
+    add a partition that would overlap them. Each partition is therefore built as
+    a plain table, filled with its day's rows moved out of the default partition,
+    and only then attached.
+    """
+    with conn.cursor() as cursor:
+        for table in PARTITIONED_TABLES:
+            for offset in (-1, 0, 1):
+                start = day + timedelta(days=offset)
+                end = start + timedelta(days=1)
+                partition = f"{table}_{start:%Y%m%d}"
+                cursor.execute("SELECT to_regclass(%s) IS NOT NULL", (partition,))
+                if cursor.fetchone()[0]:
+                    continue
+                cursor.execute(f"CREATE TABLE {partition} (LIKE {table} INCLUDING DEFAULTS)")
+                cursor.execute(f"""
+                    WITH moved AS (
+                        DELETE FROM {table}_default
+                        WHERE timestamp >= %s AND timestamp < %s
+                        RETURNING *
+                    )
+                    INSERT INTO {partition} SELECT * FROM moved
+                """, (start, end))
+                if cursor.rowcount:
+                    logging.info("Moved %d default-partition rows into %s.", cursor.rowcount, partition)
+                cursor.execute(
+                    f"ALTER TABLE {table} ATTACH PARTITION {partition} "
+                    f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+                )
+        conn.commit()
+    logging.info("Ensured GTFS-RT partitions around %s.", day)
+
 def fetch_and_parse_feed(url, feed_type):
     try:
-        response = requests.get(url, headers=HEADERS, timeout=10)
+        response = SESSION.get(url, timeout=10)
         response.raise_for_status()
         feed = gtfs_realtime_pb2.FeedMessage()
         feed.ParseFromString(response.content)
         return feed
     except Exception as e:
-        logging.error(f"Error fetching/parsing {feed_type} feed: {e}")
+        logging.error("Error fetching/parsing %s feed: %s", feed_type, e)
         return None
 
-def store_vehicle_positions(conn, data):
-    if not data:
+def store_vehicle_positions(conn, rows):
+    if not rows:
         return
     with conn.cursor() as cursor:
-        for row in data:
-            cursor.execute(f'''
-                INSERT INTO {VEHICLE_POSITIONS_TABLE} (id, trip_id, route_id, vehicle_id, latitude, longitude, bearing, speed, timestamp, current_status)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            ''', (
-                row['id'], row['trip_id'], row['route_id'], row['vehicle_id'],
-                row['latitude'], row['longitude'], row['bearing'], row['speed'],
-                row['timestamp'], row['current_status']
-            ))
+        extras.execute_values(cursor, INSERT_VEHICLE_POSITIONS, rows, page_size=INSERT_PAGE_SIZE)
         conn.commit()
-        logging.info(f"Inserted {len(data)} vehicle positions.")
+        logging.info("Inserted %d vehicle positions.", len(rows))
 
-def store_trip_updates(conn, data):
-    if not data:
+def store_trip_updates(conn, rows):
+    if not rows:
         return
     with conn.cursor() as cursor:
-        for row in data:
-            for update in row['stop_time_updates']:
-                cursor.execute(f'''
-                    INSERT INTO {TRIP_UPDATES_TABLE} (id, trip_id, route_id, direction_id, start_time, start_date, timestamp, stop_id, stop_sequence, arrival_delay, arrival_time, departure_delay, departure_time)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                ''', (
-                    row['id'], row['trip_id'], row['route_id'], row['direction_id'],
-                    row['start_time'], row['start_date'], row['timestamp'],
-                    update['stop_id'], update['stop_sequence'],
-                    update['arrival_delay'], update['arrival_time'],
-                    update['departure_delay'], update['departure_time']
-                ))
+        extras.execute_values(cursor, INSERT_TRIP_UPDATES, rows, page_size=INSERT_PAGE_SIZE)
         conn.commit()
-        logging.info(f"Inserted {len(data)} trip updates.")
+        logging.info("Inserted %d trip updates.", len(rows))
 
 def process_vehicle_positions(feed):
+    """Flatten vehicle entities straight into rows in INSERT_VEHICLE_POSITIONS column order"""
     if not feed:
         return []
-    processed_data = []
+    rows = []
     for entity in feed.entity:
         if entity.HasField('vehicle'):
             vehicle = entity.vehicle
-            processed_data.append({
-                "id": entity.id,
-                "trip_id": vehicle.trip.trip_id,
-                "route_id": vehicle.trip.route_id,
-                "vehicle_id": vehicle.vehicle.id,
-                "latitude": vehicle.position.latitude,
-                "longitude": vehicle.position.longitude,
-                "bearing": vehicle.position.bearing,
-                "speed": vehicle.position.speed,
-                "timestamp": datetime.fromtimestamp(vehicle.timestamp) if vehicle.HasField('timestamp') else None,
-                "current_status": gtfs_realtime_pb2.VehiclePosition.VehicleStopStatus.Name(vehicle.current_status) if vehicle.HasField('current_status') else None
-            })
-    return processed_data
+            trip = vehicle.trip
+            position = vehicle.position
+            rows.append((
+                entity.id,
+                # Both feeds repeat the same trip/route ids, so share one string object
+                sys.intern(trip.trip_id),
+                sys.intern(trip.route_id),
+                vehicle.vehicle.id,
+                position.latitude,
+                position.longitude,
+                position.bearing,
+                position.speed,
+                datetime.fromtimestamp(vehicle.timestamp) if vehicle.HasField('timestamp') else None,
+                VEHICLE_STOP_STATUS_NAMES[vehicle.current_status] if vehicle.HasField('current_status') else None
+            ))
+    return rows
 
 def process_trip_updates(feed):
+    """Flatten trip updates into one row per stop time update, in INSERT_TRIP_UPDATES column order"""
     if not feed:
         return []
-    processed_data = []
+    rows = []
     for entity in feed.entity:
         if entity.HasField('trip_update'):
             trip_update = entity.trip_update
-            updates = []
+            trip = trip_update.trip
+            trip_fields = (
+                entity.id,
+                sys.intern(trip.trip_id),
+                sys.intern(trip.route_id),
+                trip.direction_id if trip.HasField('direction_id') else None,
+                trip.start_time if trip.HasField('start_time') else None,
+                trip.start_date if trip.HasField('start_date') else None,
+                datetime.fromtimestamp(trip_update.timestamp) if trip_update.HasField('timestamp') else None,
+            )
             for stop_time_update in trip_update.stop_time_update:
-                updates.append({
-                    "stop_id": stop_time_update.stop_id,
-                    "stop_sequence": stop_time_update.stop_sequence,
-                    "arrival_delay": stop_time_update.arrival.delay if stop_time_update.HasField('arrival') and stop_time_update.arrival.HasField('delay') else None,
-                    "arrival_time": datetime.fromtimestamp(stop_time_update.arrival.time) if stop_time_update.HasField('arrival') and stop_time_update.arrival.HasField('time') else None,
-                    "departure_delay": stop_time_update.departure.delay if stop_time_update.HasField('departure') and stop_time_update.departure.HasField('delay') else None,
-                    "departure_time": datetime.fromtimestamp(stop_time_update.departure.time) if stop_time_update.HasField('departure') and stop_time_update.departure.HasField('time') else None,
-                })
-            processed_data.append({
-                "id": entity.id,
-                "trip_id": trip_update.trip.trip_id,
-                "route_id": trip_update.trip.route_id,
-                "direction_id": trip_update.trip.direction_id if trip_update.trip.HasField('direction_id') else None,
-                "start_time": trip_update.trip.start_time if trip_update.trip.HasField('start_time') else None,
-                "start_date": trip_update.trip.start_date if trip_update.trip.HasField('start_date') else None,
-                "timestamp": datetime.fromtimestamp(trip_update.timestamp) if trip_update.HasField('timestamp') else None,
-                "stop_time_updates": updates
-            })
-    return processed_data
+                arrival = stop_time_update.arrival if stop_time_update.HasField('arrival') else None
+                departure = stop_time_update.departure if stop_time_update.HasField('departure') else None
+                rows.append(trip_fields + (
+                    sys.intern(stop_time_update.stop_id),
+                    stop_time_update.stop_sequence,
+                    arrival.delay if arrival is not None and arrival.HasField('delay') else None,
+                    datetime.fromtimestamp(arrival.time) if arrival is not None and arrival.HasField('time') else None,
+                    departure.delay if departure is not None and departure.HasField('delay') else None,
+                    datetime.fromtimestamp(departure.time) if departure is not None and departure.HasField('time') else None,
+                ))
+    return rows
+
+async def fetch_feeds_async():
+    """Fetch and parse both feeds side by side without tying up the event loop"""
+    loop = asyncio.get_running_loop()
+    return await asyncio.gather(
+        loop.run_in_executor(FETCH_EXECUTOR, fetch_and_parse_feed, VEHICLE_POSITIONS_URL, "Vehicle Positions"),
+        loop.run_in_executor(FETCH_EXECUTOR, fetch_and_parse_feed, TRIP_UPDATES_URL, "Trip Updates"),
+    )
+
+async def ingest_gtfs_realtime_stream_async(conn, interval_seconds=30):
+    loop = asyncio.get_running_loop()
+    partitions_day = None
+    while True:
+        started = loop.time()
+        logging.info("Fetching GTFS-RT data at %s", datetime.now().isoformat())
+        # Roll partitions forward once per day rather than on every poll
+        today = datetime.now().date()
+        if today != partitions_day:
+            ensure_daily_partitions(conn, today)
+            partitions_day = today
+        vp_feed, tu_feed = await fetch_feeds_async()
+        store_vehicle_positions(conn, process_vehicle_positions(vp_feed))
+        store_trip_updates(conn, process_trip_updates(tu_feed))
+        # Keep a fixed cadence: time spent fetching and storing comes out of the wait
+        await asyncio.sleep(max(0.0, interval_seconds - (loop.time() - started)))
 
 def ingest_gtfs_realtime_stream(interval_seconds=30):
-    logging.info(f"Starting GTFS-RT ingestion stream, polling every {interval_seconds} seconds...")
+    logging.info("Starting GTFS-RT ingestion stream, polling every %s seconds...", interval_seconds)
     conn = create_db_connection()
     setup_tables(conn)
     try:
-        while True:
-            logging.info(f"Fetching GTFS-RT data at {datetime.now().isoformat()}")
-            # Fetch and process Vehicle Positions
-            vp_feed = fetch_and_parse_feed(VEHICLE_POSITIONS_URL, "Vehicle Positions")
-            vehicle_positions_data = process_vehicle_positions(vp_feed)
-            store_vehicle_positions(conn, vehicle_positions_data)
-            # Fetch and process Trip Updates
-            tu_feed = fetch_and_parse_feed(TRIP_UPDATES_URL, "Trip Updates")
-            trip_updates_data = process_trip_updates(tu_feed)
-            store_trip_updates(conn, trip_updates_data)
-            time.sleep(interval_seconds)
+        asyncio.run(ingest_gtfs_realtime_stream_async(conn, interval_seconds))
     except KeyboardInterrupt:
         logging.info("Ingestion stopped by user.")
     except Exception as e:
-        logging.error(f"Fatal error in ingestion loop: {e}")
+        logging.error("Fatal error in ingestion loop: %s", e)
     finally:
         conn.close()
         logging.info("Database connection closed.")
@@ -2,59 +2,143 @@
 GTFS-Realtime Data Processor
 Handles continuous polling and processing of MARTA's GTFS-RT feeds
 """
-import os
+import io
+import asyncio
+import csv
 import logging
 import time
 import json
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+import operator
+import random
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Any, Tuple, Union
 import requests
 import psycopg2
 from psycopg2 import extras
 import pandas as pd
 import numpy as np
 
-from google.transit import gtfs_realtime_pb2
-
 from config.settings import settings
+from src.data_ingestion.gtfs_rt_common import VEHICLE_STOP_STATUS_NAMES, gtfs_realtime_pb2
+from src.data_ingestion.common import ConnectionPool, make_http_session
 
 logger = logging.getLogger(__name__)
 
+# Batches at least this large are streamed with COPY instead of execute_values
+COPY_THRESHOLD = 1000
+
+# Poll intervals are randomized by up to this fraction either way
+POLL_JITTER_FRACTION = 0.1
+
+# How long the in-memory static trip/route cache is trusted before reloading
+STATIC_CACHE_TTL = timedelta(hours=24)
+
+# Indexed by date.weekday(); avoids a locale-dependent strftime("%A") per record
+WEEKDAY_NAMES = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+
+HOLIDAYS_2024 = frozenset({
+    date(2024, 1, 1),    # New Year's Day
+    date(2024, 1, 15),   # Martin Luther King Jr. Day
+    date(2024, 2, 19),   # Presidents' Day
+    date(2024, 5, 27),   # Memorial Day
+    date(2024, 7, 4),    # Independence Day
+    date(2024, 9, 2),    # Labor Day
+    date(2024, 10, 14),  # Columbus Day
+    date(2024, 11, 11),  # Veterans Day
+    date(2024, 11, 28),  # Thanksgiving Day
+    date(2024, 12, 25),  # Christmas Day
+})
+
+# Columns written to unified_realtime_historical_data, in insert order
+UNIFIED_COLUMNS = [
+    "timestamp", "trip_id", "route_id", "stop_id", "stop_sequence",
+    "vehicle_id", "latitude", "longitude", "scheduled_arrival_time",
+    "actual_arrival_time", "scheduled_departure_time", "actual_departure_time",
+    "delay_minutes", "day_of_week", "hour_of_day", "is_weekend", "is_holiday"
+]
+
+# Fixed execute_values row template so psycopg2 does not rebuild it per call
+UNIFIED_ROW_TEMPLATE = "(" + ", ".join(["%s"] * len(UNIFIED_COLUMNS)) + ")"
+
+# Pulls a RealtimeRecord's UNIFIED_COLUMNS values as a tuple in a single C-level call
+_unified_row = operator.attrgetter(*UNIFIED_COLUMNS)
+
+
+@dataclass(slots=True)
+class RealtimeRecord:
+    """A vehicle position or stop time update on its way to the unified table"""
+    id: Optional[str] = None
+    timestamp: Optional[datetime] = None
+    trip_id: Optional[str] = None
+    route_id: Optional[str] = None
+    stop_id: Optional[str] = None
+    stop_sequence: Optional[int] = None
+    vehicle_id: Optional[str] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    bearing: Optional[float] = None
+    speed: Optional[float] = None
+    current_status: Optional[str] = None
+    direction_id: Optional[int] = None
+    start_time: Optional[str] = None
+    start_date: Optional[str] = None
+    arrival_delay: Optional[int] = None
+    arrival_time: Optional[datetime] = None
+    departure_delay: Optional[int] = None
+    departure_time: Optional[datetime] = None
+    scheduled_arrival_time: Optional[datetime] = None
+    actual_arrival_time: Optional[datetime] = None
+    scheduled_departure_time: Optional[datetime] = None
+    actual_departure_time: Optional[datetime] = None
+    delay_minutes: Optional[float] = None
+    departure_delay_minutes: Optional[float] = None
+    route_short_name: Optional[str] = None
+    route_long_name: Optional[str] = None
+    day_of_week: Optional[str] = None
+    hour_of_day: Optional[int] = None
+    is_weekend: Optional[bool] = None
+    is_holiday: Optional[bool] = None
+
 
 class GTFSRealtimeProcessor:
     """Handles GTFS-Realtime data processing from MARTA"""
     
     def __init__(self):
-        self.db_connection = None
+        # A pool lets fetch threads and writers use the database concurrently
+        self._pool = ConnectionPool(
+            minconn=2,
+            maxconn=8,
+            host=settings.DB_HOST,
+            database=settings.DB_NAME,
+            user=settings.DB_USER,
+            password=settings.DB_PASSWORD,
+            port=settings.DB_PORT
+        )
         self.headers = {}
+        self._trip_lookup = None
+        self._trip_lookup_loaded_at = None
+        # One generator for all synthetic draws, seeded for reproducible demo data
+        self._rng = np.random.default_rng(settings.RANDOM_SEED)
+        # The two feeds are independent, so they are fetched side by side
+        self._executor = ThreadPoolExecutor(max_workers=4)
         
         # Set up API headers if API key is available
         if settings.MARTA_API_KEY:
             self.headers = {"x-api-key": settings.MARTA_API_KEY}
         
+        # Keep-alive session so polls reuse TCP/TLS connections to the feed host.
+        # Only feeds go through this session, so always ask for a compressed protobuf body
+        self.session = make_http_session(pool_connections=4, pool_maxsize=4, retries=3, headers={
+            **self.headers, "Accept": "application/x-protobuf", "Accept-Encoding": "gzip, deflate"
+        })
+        
         # Create unified data table for real-time data
         self.create_unified_table()
     
-    def create_db_connection(self):
-        """Create database connection"""
-        try:
-            self.db_connection = psycopg2.connect(
-                host=settings.DB_HOST,
-                database=settings.DB_NAME,
-                user=settings.DB_USER,
-                password=settings.DB_PASSWORD,
-                port=settings.DB_PORT
-            )
-            logger.info("Database connection established")
-        except Exception as e:
-            logger.error(f"Failed to connect to database: {e}")
-            raise
-    
     def create_unified_table(self):
         """Create unified table for real-time and historical data"""
-        if not self.db_connection:
-            self.create_db_connection()
-        
         create_unified_table_sql = """
             CREATE TABLE IF NOT EXISTS unified_realtime_historical_data (
                 record_id UUID DEFAULT gen_random_uuid() PRIMARY KEY,
@@ -95,21 +179,38 @@ class GTFSRealtimeProcessor:
             CREATE INDEX IF NOT EXISTS idx_unified_route_id ON unified_realtime_historical_data(route_id);
         """
         
-        with self.db_connection.cursor() as cursor:
+        with self._pool.connection() as conn, conn.cursor() as cursor:
             cursor.execute(create_unified_table_sql)
-            self.db_connection.commit()
+            conn.commit()
             logger.info("Unified real-time historical data table created")
+            
+            # Natural key so retried or overlapping loads are deduplicated on insert. Vehicle
+            # positions carry no stop_id, and NULLs never collide in a unique index, so the
+            # key columns are coalesced; this also replaces the earlier plain-column index
+            try:
+                cursor.execute("""
+                    CREATE UNIQUE INDEX IF NOT EXISTS uq_unified_trip_stop_key
+                    ON unified_realtime_historical_data (COALESCE(trip_id, ''), COALESCE(stop_id, ''), timestamp)
+                """)
+                cursor.execute("DROP INDEX IF EXISTS uq_unified_trip_stop_timestamp")
+                conn.commit()
+            except psycopg2.Error as e:
+                conn.rollback()
+                logger.warning(f"Could not create unique index on unified data (existing duplicates?): {e}")
     
     def fetch_and_parse_feed(self, url: str, feed_type: str) -> Optional[gtfs_realtime_pb2.FeedMessage]:
         """Fetch and parse GTFS-RT feed"""
         try:
-            response = requests.get(url, headers=self.headers, timeout=10, verify=False)
-            response.raise_for_status()
-            
             feed = gtfs_realtime_pb2.FeedMessage()
-            feed.ParseFromString(response.content)
+            # Stream the body and parse the single buffer urllib3 returns,
+            # skipping the chunk-join copy that response.content makes
+            with self.session.get(url, timeout=10, verify=False, stream=True) as response:
+                response.raise_for_status()
+                feed.ParseFromString(response.raw.read(decode_content=True))
+                content_encoding = response.headers.get('Content-Encoding', 'identity')
             
-            logger.debug(f"Successfully fetched {feed_type} feed with {len(feed.entity)} entities")
+            logger.debug(f"Successfully fetched {feed_type} feed with {len(feed.entity)} entities "
+                         f"(Content-Encoding: {content_encoding})")
             return feed
             
         except requests.exceptions.RequestException as e:
@@ -119,7 +220,17 @@ class GTFSRealtimeProcessor:
             logger.error(f"Error parsing {feed_type} feed: {e}")
             return None
     
-    def process_vehicle_positions(self, feed: gtfs_realtime_pb2.FeedMessage) -> List[Dict[str, Any]]:
+    def fetch_feeds(self) -> Tuple[Optional[gtfs_realtime_pb2.FeedMessage], Optional[gtfs_realtime_pb2.FeedMessage]]:
+        """Fetch the vehicle position and trip update feeds concurrently"""
+        vp_future = self._executor.submit(
+            self.fetch_and_parse_feed, settings.MARTA_GTFS_RT_VEHICLE_URL, "Vehicle Positions"
+        )
+        tu_future = self._executor.submit(
+            self.fetch_and_parse_feed, settings.MARTA_GTFS_RT_TRIP_URL, "Trip Updates"
+        )
+        return vp_future.result(), tu_future.result()
+    
+    def process_vehicle_positions(self, feed: gtfs_realtime_pb2.FeedMessage) -> List[RealtimeRecord]:
         """Process vehicle positions from GTFS-RT feed"""
         if not feed:
             return []
@@ -128,25 +239,29 @@ class GTFSRealtimeProcessor:
         for entity in feed.entity:
             if entity.HasField('vehicle'):
                 vehicle = entity.vehicle
+                # Check each sub-message once; unset scalars read as their defaults
+                trip = vehicle.trip if vehicle.HasField('trip') else None
+                position = vehicle.position if vehicle.HasField('position') else None
                 
                 # Extract vehicle position data
-                vehicle_data = {
-                    "id": entity.id,
-                    "trip_id": vehicle.trip.trip_id if vehicle.HasField('trip') else None,
-                    "route_id": vehicle.trip.route_id if vehicle.HasField('trip') else None,
-                    "vehicle_id": vehicle.vehicle.id if vehicle.HasField('vehicle') else None,
-                    "latitude": vehicle.position.latitude if vehicle.HasField('position') else None,
-                    "longitude": vehicle.position.longitude if vehicle.HasField('position') else None,
-                    "bearing": vehicle.position.bearing if vehicle.HasField('position') else None,
-                    "speed": vehicle.position.speed if vehicle.HasField('position') else None,
-                    "timestamp": datetime.fromtimestamp(vehicle.timestamp) if vehicle.HasField('timestamp') else None,
-                    "current_status": gtfs_realtime_pb2.VehiclePosition.VehicleStopStatus.Name(vehicle.current_status) if vehicle.HasField('current_status') else None
-                }
+                vehicle_data = RealtimeRecord(
+                    id=entity.id,
+                    trip_id=trip.trip_id if trip is not None else None,
+                    route_id=trip.route_id if trip is not None else None,
+                    vehicle_id=vehicle.vehicle.id if vehicle.HasField('vehicle') else None,
+                    latitude=position.latitude if position is not None else None,
+                    longitude=position.longitude if position is not None else None,
+                    bearing=position.bearing if position is not None else None,
+                    speed=position.speed if position is not None else None,
+                    # A zero POSIX timestamp means the field was never set
+                    timestamp=datetime.fromtimestamp(vehicle.timestamp) if vehicle.timestamp else None,
+                    current_status=VEHICLE_STOP_STATUS_NAMES[vehicle.current_status] if vehicle.HasField('current_status') else None
+                )
                 processed_data.append(vehicle_data)
         
         return processed_data
     
-    def process_trip_updates(self, feed: gtfs_realtime_pb2.FeedMessage) -> List[Dict[str, Any]]:
+    def process_trip_updates(self, feed: gtfs_realtime_pb2.FeedMessage) -> List[RealtimeRecord]:
         """Process trip updates from GTFS-RT feed"""
         if not feed:
             return []
@@ -156,96 +271,124 @@ class GTFSRealtimeProcessor:
             if entity.HasField('trip_update'):
                 trip_update = entity.trip_update
                 
+                # Trip-level fields are shared by every stop time update of the entity
+                trip = trip_update.trip
+                has_trip = trip_update.HasField('trip')
+                trip_id = trip.trip_id if has_trip else None
+                route_id = trip.route_id if has_trip else None
+                direction_id = trip.direction_id if trip.HasField('direction_id') else None
+                start_time = trip.start_time or None
+                start_date = trip.start_date or None
+                timestamp = datetime.fromtimestamp(trip_update.timestamp) if trip_update.timestamp else None
+                
                 # Process stop time updates
                 for stop_time_update in trip_update.stop_time_update:
-                    update_data = {
-                        "id": entity.id,
-                        "trip_id": trip_update.trip.trip_id if trip_update.HasField('trip') else None,
-                        "route_id": trip_update.trip.route_id if trip_update.HasField('trip') else None,
-                        "direction_id": trip_update.trip.direction_id if trip_update.trip.HasField('direction_id') else None,
-                        "start_time": trip_update.trip.start_time if trip_update.trip.HasField('start_time') else None,
-                        "start_date": trip_update.trip.start_date if trip_update.trip.HasField('start_date') else None,
-                        "timestamp": datetime.fromtimestamp(trip_update.timestamp) if trip_update.HasField('timestamp') else None,
-                        "stop_id": stop_time_update.stop_id,
-                        "stop_sequence": stop_time_update.stop_sequence if stop_time_update.HasField('stop_sequence') else None,
-                        "arrival_delay": stop_time_update.arrival.delay if stop_time_update.HasField('arrival') and stop_time_update.arrival.HasField('delay') else None,
-                        "arrival_time": datetime.fromtimestamp(stop_time_update.arrival.time) if stop_time_update.HasField('arrival') and stop_time_update.arrival.HasField('time') else None,
-                        "departure_delay": stop_time_update.departure.delay if stop_time_update.HasField('departure') and stop_time_update.departure.HasField('delay') else None,
-                        "departure_time": datetime.fromtimestamp(stop_time_update.departure.time) if stop_time_update.HasField('departure') and stop_time_update.departure.HasField('time') else None,
-                    }
+                    arrival = stop_time_update.arrival if stop_time_update.HasField('arrival') else None
+                    departure = stop_time_update.departure if stop_time_update.HasField('departure') else None
+                    update_data = RealtimeRecord(
+                        id=entity.id,
+                        trip_id=trip_id,
+                        route_id=route_id,
+                        direction_id=direction_id,
+                        start_time=start_time,
+                        start_date=start_date,
+                        timestamp=timestamp,
+                        stop_id=stop_time_update.stop_id,
+                        stop_sequence=stop_time_update.stop_sequence if stop_time_update.HasField('stop_sequence') else None,
+                        # A zero delay is meaningful (on time), so it still needs HasField
+                        arrival_delay=arrival.delay if arrival is not None and arrival.HasField('delay') else None,
+                        arrival_time=datetime.fromtimestamp(arrival.time) if arrival is not None and arrival.time else None,
+                        departure_delay=departure.delay if departure is not None and departure.HasField('delay') else None,
+                        departure_time=datetime.fromtimestamp(departure.time) if departure is not None and departure.time else None,
+                    )
                     processed_data.append(update_data)
         
         return processed_data
     
-    def enrich_with_static_data(self, realtime_data: List[Dict[str, Any]], data_type: str) -> List[Dict[str, Any]]:
-        """Enrich real-time data with static GTFS information"""
+    def enrich_with_static_data(self, realtime_data: List[RealtimeRecord], data_type: str) -> List[RealtimeRecord]:
+        """Enrich real-time records in place with static GTFS information"""
         if not realtime_data:
             return []
         
-        enriched_data = []
+        # Resolve every distinct trip in one query instead of one per record
+        trip_ids = {record.trip_id for record in realtime_data if record.trip_id}
+        static_lookup = self.get_static_trip_data_bulk(trip_ids)
         
         for record in realtime_data:
-            enriched_record = record.copy()
-            
             # Add temporal features
-            if record.get('timestamp'):
-                timestamp = record['timestamp']
-                enriched_record.update({
-                    "day_of_week": timestamp.strftime("%A"),
-                    "hour_of_day": timestamp.hour,
-                    "is_weekend": timestamp.weekday() >= 5,
-                    "is_holiday": self.is_holiday(timestamp.date())
-                })
+            if record.timestamp:
+                timestamp = record.timestamp
+                record.day_of_week = WEEKDAY_NAMES[timestamp.weekday()]
+                record.hour_of_day = timestamp.hour
+                record.is_weekend = timestamp.weekday() >= 5
+                record.is_holiday = self.is_holiday(timestamp.date())
             
             # Add static GTFS data if trip_id is available
-            if record.get('trip_id'):
-                static_data = self.get_static_trip_data(record['trip_id'])
+            if record.trip_id:
+                static_data = static_lookup.get(record.trip_id)
                 if static_data:
-                    enriched_record.update(static_data)
+                    record.route_id = static_data["route_id"]
+                    record.route_short_name = static_data["route_short_name"]
+                    record.route_long_name = static_data["route_long_name"]
             
             # Calculate delay if both scheduled and actual times are available
             if data_type == "trip_updates":
-                enriched_record = self.calculate_delays(enriched_record)
-            
-            enriched_data.append(enriched_record)
+                self.calculate_delays(record)
         
-        return enriched_data
+        return realtime_data
     
-    def get_static_trip_data(self, trip_id: str) -> Optional[Dict[str, Any]]:
-        """Get static GTFS data for a trip"""
-        if not self.db_connection:
-            return None
-        
+    def refresh_static_cache(self):
+        """Load the static trip/route table into memory
+
+        Static GTFS changes at most weekly, so lookups are served from this
+        cache and it is reloaded once STATIC_CACHE_TTL has passed.
+        """
         try:
-            with self.db_connection.cursor() as cursor:
+            with self._pool.connection() as conn, conn.cursor() as cursor:
                 cursor.execute("""
-                    SELECT t.route_id, r.route_short_name, r.route_long_name
+                    SELECT t.trip_id, t.route_id, r.route_short_name, r.route_long_name
                     FROM gtfs_trips t
                     JOIN gtfs_routes r ON t.route_id = r.route_id
-                    WHERE t.trip_id = %s
-                """, (trip_id,))
+                """)
                 
-                result = cursor.fetchone()
-                if result:
-                    return {
-                        "route_id": result[0],
-                        "route_short_name": result[1],
-                        "route_long_name": result[2]
+                self._trip_lookup = {
+                    row[0]: {
+                        "route_id": row[1],
+                        "route_short_name": row[2],
+                        "route_long_name": row[3]
                     }
+                    for row in cursor.fetchall()
+                }
+                self._trip_lookup_loaded_at = datetime.now()
+                logger.info(f"Cached static data for {len(self._trip_lookup)} trips")
         except Exception as e:
             logger.error(f"Error fetching static trip data: {e}")
-        
-        return None
     
-    def calculate_delays(self, record: Dict[str, Any]) -> Dict[str, Any]:
+    def _static_trip_lookup(self) -> Dict[str, Dict[str, Any]]:
+        """Return the static trip cache, loading it on first use or once stale"""
+        if (self._trip_lookup is None
+                or datetime.now() - self._trip_lookup_loaded_at > STATIC_CACHE_TTL):
+            self.refresh_static_cache()
+        return self._trip_lookup or {}
+    
+    def get_static_trip_data(self, trip_id: str) -> Optional[Dict[str, Any]]:
+        """Get static GTFS data for a trip"""
+        return self._static_trip_lookup().get(trip_id)
+    
+    def get_static_trip_data_bulk(self, trip_ids) -> Dict[str, Dict[str, Any]]:
+        """Get static GTFS data for many trips at once"""
+        lookup = self._static_trip_lookup()
+        return {trip_id: lookup[trip_id] for trip_id in trip_ids if trip_id in lookup}
+    
+    def calculate_delays(self, record: RealtimeRecord) -> RealtimeRecord:
         """Calculate delays between scheduled and actual times"""
-        if record.get('arrival_time') and record.get('scheduled_arrival_time'):
-            arrival_delay = (record['arrival_time'] - record['scheduled_arrival_time']).total_seconds() / 60
-            record['delay_minutes'] = arrival_delay
+        if record.arrival_time and record.scheduled_arrival_time:
+            arrival_delay = (record.arrival_time - record.scheduled_arrival_time).total_seconds() / 60
+            record.delay_minutes = arrival_delay
         
-        if record.get('departure_time') and record.get('scheduled_departure_time'):
-            departure_delay = (record['departure_time'] - record['scheduled_departure_time']).total_seconds() / 60
-            record['departure_delay_minutes'] = departure_delay
+        if record.departure_time and record.scheduled_departure_time:
+            departure_delay = (record.departure_time - record.scheduled_departure_time).total_seconds() / 60
+            record.departure_delay_minutes = departure_delay
         
         return record
     
@@ -253,60 +396,70 @@ class GTFSRealtimeProcessor:
         """Check if date is a holiday (simplified implementation)"""
         # This is a simplified implementation
         # In production, you'd use a proper holiday calendar
-        holidays_2024 = [
-            "2024-01-01",  # New Year's Day
-            "2024-01-15",  # Martin Luther King Jr. Day
-            "2024-02-19",  # Presidents' Day
-            "2024-05-27",  # Memorial Day
-            "2024-07-04",  # Independence Day
-            "2024-09-02",  # Labor Day
-            "2024-10-14",  # Columbus Day
-            "2024-11-11",  # Veterans Day
-            "2024-11-28",  # Thanksgiving Day
-            "2024-12-25",  # Christmas Day
-        ]
-        
-        return date.strftime("%Y-%m-%d") in holidays_2024
+        return date in HOLIDAYS_2024
     
-    def store_realtime_data(self, data: List[Dict[str, Any]]):
-        """Store processed real-time data in database"""
-        if not data:
+    def store_realtime_data(self, data: Union[List[RealtimeRecord], pd.DataFrame]):
+        """Store processed real-time data in database
+
+        Accepts either a list of RealtimeRecord (live feeds) or a DataFrame
+        (synthetic generator); extra DataFrame columns are ignored.
+        """
+        if data is None or len(data) == 0:
             return
         
-        if not self.db_connection:
-            self.create_db_connection()
-        
         # Prepare data for insertion
-        columns = [
-            "timestamp", "trip_id", "route_id", "stop_id", "stop_sequence",
-            "vehicle_id", "latitude", "longitude", "scheduled_arrival_time",
-            "actual_arrival_time", "scheduled_departure_time", "actual_departure_time",
-            "delay_minutes", "day_of_week", "hour_of_day", "is_weekend", "is_holiday"
-        ]
+        columns = UNIFIED_COLUMNS
         
-        data_to_insert = []
-        for record in data:
-            row = []
-            for col in columns:
-                row.append(record.get(col))
-            data_to_insert.append(tuple(row))
+        if isinstance(data, pd.DataFrame):
+            data_to_insert = None
+            num_rows = len(data)
+        else:
+            data_to_insert = [_unified_row(record) for record in data]
+            num_rows = len(data_to_insert)
         
         # Insert data
         cols_str = ', '.join(columns)
-        vals_str = ', '.join([f'%s' for _ in columns])
-        
-        insert_query = f"""
-            INSERT INTO unified_realtime_historical_data ({cols_str})
-            VALUES %s
-        """
         
         try:
-            with self.db_connection.cursor() as cursor:
-                extras.execute_values(cursor, insert_query, data_to_insert, page_size=1000)
-                self.db_connection.commit()
-                logger.info(f"Stored {len(data_to_insert)} real-time records")
+            with self._pool.connection() as conn, conn.cursor() as cursor:
+                if data_to_insert is None or num_rows >= COPY_THRESHOLD:
+                    # COPY skips per-row parse/bind work on large (synthetic) batches
+                    buffer = io.StringIO()
+                    if data_to_insert is None:
+                        data.reindex(columns=columns).to_csv(
+                            buffer, header=False, index=False, date_format='%Y-%m-%d %H:%M:%S.%f'
+                        )
+                    else:
+                        csv.writer(buffer).writerows(data_to_insert)
+                    buffer.seek(0)
+                    # COPY into a session-local staging table, then merge so duplicates are skipped
+                    cursor.execute("""
+                        CREATE TEMP TABLE IF NOT EXISTS stage_unified_realtime
+                        (LIKE unified_realtime_historical_data INCLUDING DEFAULTS)
+                        ON COMMIT DELETE ROWS
+                    """)
+                    cursor.copy_expert(
+                        f"COPY stage_unified_realtime ({cols_str}) FROM STDIN WITH (FORMAT csv)",
+                        buffer
+                    )
+                    cursor.execute(f"""
+                        INSERT INTO unified_realtime_historical_data ({cols_str})
+                        SELECT {cols_str} FROM stage_unified_realtime
+                        ON CONFLICT DO NOTHING
+                    """)
+                else:
+                    insert_query = f"""
+                        INSERT INTO unified_realtime_historical_data ({cols_str})
+                        VALUES %s
+                        ON CONFLICT DO NOTHING
+                    """
+                    extras.execute_values(
+                        cursor, insert_query, data_to_insert,
+                        template=UNIFIED_ROW_TEMPLATE, page_size=10000, fetch=False
+                    )
+                conn.commit()
+                logger.info(f"Stored {num_rows} real-time records")
         except Exception as e:
-            self.db_connection.rollback()
             logger.error(f"Error storing real-time data: {e}")
             raise
     
@@ -319,11 +472,10 @@ class GTFSRealtimeProcessor:
         for i in range(num_iterations):
             logger.debug(f"Fetching GTFS-RT data (iteration {i+1}/{num_iterations}) at {datetime.now().isoformat()}")
             
-            # Fetch and process Vehicle Positions
-            vp_feed = self.fetch_and_parse_feed(
-                settings.MARTA_GTFS_RT_VEHICLE_URL, 
-                "Vehicle Positions"
-            )
+            # Fetch both feeds concurrently
+            vp_feed, tu_feed = self.fetch_feeds()
+
+            # Process Vehicle Positions
             vehicle_positions_data = self.process_vehicle_positions(vp_feed)
             
             if vehicle_positions_data:
@@ -331,11 +483,7 @@ class GTFSRealtimeProcessor:
                 # Store vehicle position data
                 self.store_realtime_data(vehicle_positions_data)
             
-            # Fetch and process Trip Updates
-            tu_feed = self.fetch_and_parse_feed(
-                settings.MARTA_GTFS_RT_TRIP_URL, 
-                "Trip Updates"
-            )
+            # Process Trip Updates
             trip_updates_data = self.process_trip_updates(tu_feed)
             
             if trip_updates_data:
@@ -350,45 +498,106 @@ class GTFSRealtimeProcessor:
         
         logger.info("Historical GTFS-RT data ingestion completed.")
 
-    def ingest_historical_realtime_data(self, num_iterations: int = 10, interval_seconds: int = 30):
-        """Fetches and processes GTFS-RT feeds for a specified number of iterations.
-        This is for historical data ingestion for model training.
+    def iter_synthetic_realtime_days(self, merged_df: pd.DataFrame, num_days: int):
+        """Yield one DataFrame of synthetic real-time records per simulated day.
+
+        ``merged_df`` is the stop_times/trips/stops join, or one chunk of it;
+        only one day of output is alive at a time so callers can store it and
+        move on.
         """
-        logger.info(f"Starting historical GTFS-RT data ingestion for {num_iterations} iterations...")
-        
-        for i in range(num_iterations):
-            logger.debug(f"Fetching GTFS-RT data (iteration {i+1}/{num_iterations}) at {datetime.now().isoformat()}")
-            
-            # Fetch and process Vehicle Positions
-            vp_feed = self.fetch_and_parse_feed(
-                settings.MARTA_GTFS_RT_VEHICLE_URL, 
-                "Vehicle Positions"
-            )
-            vehicle_positions_data = self.process_vehicle_positions(vp_feed)
-            
-            if vehicle_positions_data:
-                logger.info(f"Processed {len(vehicle_positions_data)} vehicle positions")
-                # Store vehicle position data
-                self.store_realtime_data(vehicle_positions_data)
-            
-            # Fetch and process Trip Updates
-            tu_feed = self.fetch_and_parse_feed(
-                settings.MARTA_GTFS_RT_TRIP_URL, 
-                "Trip Updates"
-            )
-            trip_updates_data = self.process_trip_updates(tu_feed)
-            
-            if trip_updates_data:
-                # Enrich trip updates with static data
-                enriched_trip_data = self.enrich_with_static_data(trip_updates_data, "trip_updates")
-                logger.info(f"Processed {len(enriched_trip_data)} trip updates")
-                # Store trip update data
-                self.store_realtime_data(enriched_trip_data)
-            
-            if i < num_iterations - 1:
-                time.sleep(interval_seconds)
-        
-        logger.info("Historical GTFS-RT data ingestion completed.")
+        # Dwell-time bins for the simulated demand level
+        demand_bins = [-np.inf, 30, 60, 120, np.inf]
+        demand_labels = ['Low', 'Normal', 'High', 'Overloaded']
+        weather_conditions = ['Clear', 'Cloudy', 'Rainy', 'Sunny']
+
+        # The schedule is the same every day, so parse it once up front.
+        # GTFS times may exceed 24:00:00; unparseable ones become NaT and are dropped.
+        arrival_td = pd.to_timedelta(merged_df['arrival_time'].astype(str), errors='coerce')
+        departure_td = pd.to_timedelta(merged_df['departure_time'].astype(str), errors='coerce')
+        valid = arrival_td.notna() & departure_td.notna()
+        if not valid.all():
+            logger.warning(f"Skipping {(~valid).sum()} rows with invalid arrival/departure times")
+        day_df = merged_df[valid]
+        arrival_td = arrival_td[valid]
+        departure_td = departure_td[valid]
+        n = len(day_df)
+
+        rng = self._rng
+        current_date = datetime.now().date() - timedelta(days=num_days)
+
+        for day_offset in range(num_days):
+            date_to_simulate = current_date + timedelta(days=day_offset)
+            logger.info(f"Simulating data for {date_to_simulate}...")
+
+            # Combine date and time
+            day_start = pd.Timestamp(date_to_simulate)
+            scheduled_arrival_time = day_start + arrival_td
+            scheduled_departure_time = day_start + departure_td
+
+            # Simulate delay (normal distribution around 2 minutes, std dev 5 minutes)
+            delay_minutes = rng.normal(2, 5, n)
+            departure_noise = rng.normal(0, 1, n)  # Add small noise to departure
+            actual_arrival_time = scheduled_arrival_time + pd.to_timedelta(delay_minutes, unit='m')
+            actual_departure_time = scheduled_departure_time + pd.to_timedelta(delay_minutes + departure_noise, unit='m')
+
+            # Ensure actual times are not before scheduled times (simple correction)
+            actual_arrival_time = actual_arrival_time.where(actual_arrival_time >= scheduled_arrival_time, scheduled_arrival_time)
+            actual_departure_time = actual_departure_time.where(actual_departure_time >= scheduled_departure_time, scheduled_departure_time)
+
+            inferred_dwell_time_seconds = (actual_departure_time - actual_arrival_time).dt.total_seconds().clip(lower=0)
+
+            # Simulate demand level based on dwell time
+            inferred_demand_level = pd.cut(inferred_dwell_time_seconds, bins=demand_bins, labels=demand_labels)
+
+            # Simulate weather (simplified)
+            weather_condition = rng.choice(weather_conditions, size=n, p=[0.4, 0.3, 0.2, 0.1])
+            temperature_celsius = rng.normal(20, 5, n)  # Avg 20C, std 5C
+            precipitation_mm = np.where(weather_condition == 'Rainy', rng.uniform(0, 10, n), 0.0)
+
+            # Simulate event flag (low probability)
+            event_flag = rng.random(n) < 0.01
+
+            yield pd.DataFrame({
+                "timestamp": actual_arrival_time,
+                "trip_id": day_df['trip_id'],
+                "route_id": day_df['route_id'],
+                "stop_id": day_df['stop_id'],
+                "stop_sequence": day_df['stop_sequence'],
+                "vehicle_id": 'VEH_' + pd.Series(rng.integers(1000, 9999, n), index=day_df.index).astype(str),
+                "latitude": day_df['stop_lat'].astype(float) + rng.normal(0, 0.0001, n),  # Add small noise
+                "longitude": day_df['stop_lon'].astype(float) + rng.normal(0, 0.0001, n),  # Add small noise
+                "scheduled_arrival_time": scheduled_arrival_time,
+                "actual_arrival_time": actual_arrival_time,
+                "scheduled_departure_time": scheduled_departure_time,
+                "actual_departure_time": actual_departure_time,
+                "delay_minutes": delay_minutes,
+                "inferred_dwell_time_seconds": inferred_dwell_time_seconds,
+                "inferred_demand_level": inferred_demand_level,
+                "weather_condition": weather_condition,
+                "temperature_celsius": temperature_celsius,
+                "precipitation_mm": precipitation_mm,
+                "event_flag": event_flag,
+                # Temporal features
+                "day_of_week": WEEKDAY_NAMES[date_to_simulate.weekday()],
+                "hour_of_day": scheduled_arrival_time.dt.hour,
+                "is_weekend": date_to_simulate.weekday() >= 5,
+                "is_holiday": self.is_holiday(date_to_simulate),  # Re-use existing holiday check
+            }, index=day_df.index)
+
+    def _iter_sql_chunks(self, conn, query: str, columns: List[str], chunk_size: int = 50000):
+        """Yield a large query's rows as DataFrames of up to ``chunk_size`` rows
+
+        Rows come through a named (server-side) cursor, so neither the client
+        nor the caller ever holds more than one chunk of the result.
+        """
+        with conn.cursor(name="synthetic_source_stream") as cursor:
+            cursor.itersize = chunk_size
+            cursor.execute(query)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield pd.DataFrame(rows, columns=columns)
 
     def generate_synthetic_realtime_data(self, num_days: int = 7):
         """Generates and ingests synthetic real-time data based on static GTFS.
@@ -396,121 +605,29 @@ class GTFSRealtimeProcessor:
         """
         logger.info(f"Generating {num_days} days of synthetic real-time data...")
 
-        if not self.db_connection:
-            self.create_db_connection()
-
         try:
-            # Fetch static GTFS data
-            trips_df = pd.read_sql("SELECT trip_id, route_id, service_id FROM gtfs_trips", self.db_connection)
-            stop_times_df = pd.read_sql("SELECT trip_id, stop_id, stop_sequence, arrival_time, departure_time FROM gtfs_stop_times", self.db_connection)
-            stops_df = pd.read_sql("SELECT stop_id, stop_lat, stop_lon FROM gtfs_stops", self.db_connection)
-
-            # Merge dataframes
-            merged_df = pd.merge(stop_times_df, trips_df, on='trip_id')
-            merged_df = pd.merge(merged_df, stops_df, on='stop_id')
-
-            synthetic_data = []
-            current_date = datetime.now().date() - timedelta(days=num_days)
-
-            for day_offset in range(num_days):
-                date_to_simulate = current_date + timedelta(days=day_offset)
-                logger.info(f"Simulating data for {date_to_simulate}...")
-
-                for _, row in merged_df.iterrows():
-                    # Simulate timestamp
-                    scheduled_arrival_str = row['arrival_time']
-                    scheduled_departure_str = row['departure_time']
-
-                    # Convert time strings to timedelta for calculation
-                    try:
-                        # Handle potential 'days' in timedelta if time crosses midnight
-                        h, m, s = map(int, scheduled_arrival_str.split(':'))
-                        scheduled_arrival_td = timedelta(hours=h, minutes=m, seconds=s)
-                        h, m, s = map(int, scheduled_departure_str.split(':'))
-                        scheduled_departure_td = timedelta(hours=h, minutes=m, seconds=s)
-                    except ValueError:
-                        # Handle cases where time might be > 24:00:00 (GTFS extended times)
-                        # For simplicity, cap at 23:59:59 for now or handle more robustly
-                        logger.warning(f"Invalid time format or extended time: {scheduled_arrival_str} or {scheduled_departure_str}. Skipping row.")
-                        continue
-
-                    # Combine date and time
-                    scheduled_arrival_time = datetime.combine(date_to_simulate, (datetime.min + scheduled_arrival_td).time())
-                    scheduled_departure_time = datetime.combine(date_to_simulate, (datetime.min + scheduled_departure_td).time())
-
-                    # Simulate delay (normal distribution around 2 minutes, std dev 5 minutes)
-                    delay_minutes = np.random.normal(2, 5)
-                    actual_arrival_time = scheduled_arrival_time + timedelta(minutes=delay_minutes)
-                    actual_departure_time = scheduled_departure_time + timedelta(minutes=delay_minutes + np.random.normal(0, 1)) # Add small noise to departure
-
-                    # Ensure actual times are not before scheduled times (simple correction)
-                    if actual_arrival_time < scheduled_arrival_time:
-                        actual_arrival_time = scheduled_arrival_time
-                    if actual_departure_time < scheduled_departure_time:
-                        actual_departure_time = scheduled_departure_time
-
-                    inferred_dwell_time_seconds = (actual_departure_time - actual_arrival_time).total_seconds()
-                    if inferred_dwell_time_seconds < 0: inferred_dwell_time_seconds = 0 # Ensure non-negative
-
-                    # Simulate demand level based on dwell time
-                    if inferred_dwell_time_seconds > 120:
-                        inferred_demand_level = 'Overloaded'
-                    elif inferred_dwell_time_seconds > 60:
-                        inferred_demand_level = 'High'
-                    elif inferred_dwell_time_seconds > 30:
-                        inferred_demand_level = 'Normal'
-                    else:
-                        inferred_demand_level = 'Low'
-
-                    # Simulate weather (simplified)
-                    weather_conditions = ['Clear', 'Cloudy', 'Rainy', 'Sunny']
-                    weather_condition = np.random.choice(weather_conditions, p=[0.4, 0.3, 0.2, 0.1])
-                    temperature_celsius = np.random.normal(20, 5) # Avg 20C, std 5C
-                    precipitation_mm = np.random.uniform(0, 10) if weather_condition == 'Rainy' else 0
-
-                    # Simulate event flag (low probability)
-                    event_flag = np.random.rand() < 0.01
-
-                    # Temporal features
-                    day_of_week = date_to_simulate.strftime("%A")
-                    hour_of_day = scheduled_arrival_time.hour
-                    is_weekend = date_to_simulate.weekday() >= 5
-                    is_holiday = self.is_holiday(date_to_simulate) # Re-use existing holiday check
-
-                    synthetic_data.append({
-                        "timestamp": actual_arrival_time,
-                        "trip_id": row['trip_id'],
-                        "route_id": row['route_id'],
-                        "stop_id": row['stop_id'],
-                        "stop_sequence": row['stop_sequence'],
-                        "vehicle_id": f"VEH_{np.random.randint(1000, 9999)}",
-                        "latitude": row['stop_lat'] + np.random.normal(0, 0.0001), # Add small noise
-                        "longitude": row['stop_lon'] + np.random.normal(0, 0.0001), # Add small noise
-                        "scheduled_arrival_time": scheduled_arrival_time,
-                        "actual_arrival_time": actual_arrival_time,
-                        "scheduled_departure_time": scheduled_departure_time,
-                        "actual_departure_time": actual_departure_time,
-                        "delay_minutes": delay_minutes,
-                        "inferred_dwell_time_seconds": inferred_dwell_time_seconds,
-                        "inferred_demand_level": inferred_demand_level,
-                        "weather_condition": weather_condition,
-                        "temperature_celsius": temperature_celsius,
-                        "precipitation_mm": precipitation_mm,
-                        "event_flag": event_flag,
-                        "day_of_week": day_of_week,
-                        "hour_of_day": hour_of_day,
-                        "is_weekend": is_weekend,
-                        "is_holiday": is_holiday,
-                        "zone_id": None, # Not available from static GTFS, can be added later
-                        "nearby_pois_count": None, # Not available from static GTFS, can be added later
-                        "historical_dwell_time_avg": None, # Calculated later
-                        "historical_headway_avg": None # Calculated later
-                    })
-            
-            # Store generated data in batches
-            if synthetic_data:
-                self.store_realtime_data(synthetic_data)
-                synthetic_data = [] # Clear for next batch/day
+            with self._pool.connection() as conn:
+                # The small lookup tables are loaded whole and hash-joined by index
+                trips_df = pd.read_sql("SELECT trip_id, route_id FROM gtfs_trips", conn)
+                stops_df = pd.read_sql("SELECT stop_id, stop_lat, stop_lon FROM gtfs_stops", conn)
+                trips_lookup = trips_df.set_index('trip_id')[['route_id']]
+                stops_lookup = stops_df.set_index('stop_id')[['stop_lat', 'stop_lon']]
+
+                # stop_times is by far the largest table, so it is streamed through a
+                # server-side cursor and each chunk is simulated and stored before the next
+                stop_times_chunks = self._iter_sql_chunks(
+                    conn,
+                    "SELECT trip_id, stop_id, stop_sequence, arrival_time, departure_time FROM gtfs_stop_times",
+                    ["trip_id", "stop_id", "stop_sequence", "arrival_time", "departure_time"]
+                )
+                for stop_times_df in stop_times_chunks:
+                    merged_df = (
+                        stop_times_df
+                        .join(trips_lookup, on='trip_id', how='inner')
+                        .join(stops_lookup, on='stop_id', how='inner')
+                    )
+                    for day_df in self.iter_synthetic_realtime_days(merged_df, num_days):
+                        self.store_realtime_data(day_df)
 
         except Exception as e:
             logger.error(f"Error generating synthetic data: {e}")
@@ -518,6 +635,78 @@ class GTFSRealtimeProcessor:
 
         logger.info("Synthetic real-time data generation completed.")
 
+    def _store_poll_results(self, vehicle_positions_data: List[RealtimeRecord],
+                            enriched_trip_data: List[RealtimeRecord]):
+        """Write one poll's records; runs on the executor so the event loop stays free"""
+        if vehicle_positions_data:
+            self.store_realtime_data(vehicle_positions_data)
+        if enriched_trip_data:
+            self.store_realtime_data(enriched_trip_data)
+    
+    async def _finish_store(self, pending_store: Optional[asyncio.Future]):
+        """Wait for a queued poll write, logging its failure instead of raising it"""
+        if pending_store is None:
+            return
+        try:
+            # Shielded so cancelling the poll loop never abandons a write mid-flight
+            await asyncio.shield(pending_store)
+        except Exception as e:
+            logger.error(f"Error storing GTFS-RT data: {e}")
+    
+    async def _process_gtfs_realtime_stream_async(self, interval_seconds: int):
+        """Poll loop that overlaps each poll's database writes with the wait for the next one"""
+        loop = asyncio.get_running_loop()
+        pending_store = None
+        
+        try:
+            while True:
+                started = loop.time()
+                try:
+                    logger.debug(f"Fetching GTFS-RT data at {datetime.now().isoformat()}")
+                    
+                    # Fetch both feeds concurrently
+                    vp_feed, tu_feed = await asyncio.gather(
+                        loop.run_in_executor(
+                            self._executor, self.fetch_and_parse_feed,
+                            settings.MARTA_GTFS_RT_VEHICLE_URL, "Vehicle Positions"
+                        ),
+                        loop.run_in_executor(
+                            self._executor, self.fetch_and_parse_feed,
+                            settings.MARTA_GTFS_RT_TRIP_URL, "Trip Updates"
+                        ),
+                    )
+                    
+                    # Process Vehicle Positions
+                    vehicle_positions_data = self.process_vehicle_positions(vp_feed)
+                    if vehicle_positions_data:
+                        logger.info(f"Processed {len(vehicle_positions_data)} vehicle positions")
+                    
+                    # Process Trip Updates and enrich them with static data
+                    enriched_trip_data = self.enrich_with_static_data(
+                        self.process_trip_updates(tu_feed), "trip_updates"
+                    )
+                    if enriched_trip_data:
+                        logger.info(f"Processed {len(enriched_trip_data)} trip updates")
+                    
+                except Exception as e:
+                    # Continue polling even after errors; a queued write is still awaited next time
+                    logger.error(f"Error in GTFS-RT processing: {e}")
+                else:
+                    # Finish the previous poll's writes before queueing this one, keeping order.
+                    # A failed previous write is logged there and does not drop this poll's data
+                    await self._finish_store(pending_store)
+                    pending_store = loop.run_in_executor(
+                        self._executor, self._store_poll_results,
+                        vehicle_positions_data, enriched_trip_data
+                    )
+                
+                # Wait before next poll; jitter keeps polls from lining up with other clients
+                jitter = random.uniform(-POLL_JITTER_FRACTION, POLL_JITTER_FRACTION) * interval_seconds
+                await asyncio.sleep(max(0.0, interval_seconds - (loop.time() - started) + jitter))
+        finally:
+            # Let the last queued write land before the loop goes away
+            await self._finish_store(pending_store)
+    
     def process_gtfs_realtime_stream(self, interval_seconds: int = None):
         """Main method to process GTFS-RT streams continuously"""
         if interval_seconds is None:
@@ -525,51 +714,13 @@ class GTFSRealtimeProcessor:
         
         logger.info(f"Starting GTFS-RT processing stream, polling every {interval_seconds} seconds...")
         
-        while True:
-            try:
-                logger.debug(f"Fetching GTFS-RT data at {datetime.now().isoformat()}")
-                
-                # Fetch and process Vehicle Positions
-                vp_feed = self.fetch_and_parse_feed(
-                    settings.MARTA_GTFS_RT_VEHICLE_URL, 
-                    "Vehicle Positions"
-                )
-                vehicle_positions_data = self.process_vehicle_positions(vp_feed)
-                
-                if vehicle_positions_data:
-                    logger.info(f"Processed {len(vehicle_positions_data)} vehicle positions")
-                    # Store vehicle position data
-                    self.store_realtime_data(vehicle_positions_data)
-                
-                # Fetch and process Trip Updates
-                tu_feed = self.fetch_and_parse_feed(
-                    settings.MARTA_GTFS_RT_TRIP_URL, 
-                    "Trip Updates"
-                )
-                trip_updates_data = self.process_trip_updates(tu_feed)
-                
-                if trip_updates_data:
-                    # Enrich trip updates with static data
-                    enriched_trip_data = self.enrich_with_static_data(trip_updates_data, "trip_updates")
-                    logger.info(f"Processed {len(enriched_trip_data)} trip updates")
-                    # Store trip update data
-                    self.store_realtime_data(enriched_trip_data)
-                
-                # Wait before next poll
-                time.sleep(interval_seconds)
-                
-            except KeyboardInterrupt:
-                logger.info("GTFS-RT processing stopped by user")
-                break
-            except Exception as e:
-                logger.error(f"Error in GTFS-RT processing: {e}")
-                time.sleep(interval_seconds)  # Continue polling even after errors
+        try:
+            asyncio.run(self._process_gtfs_realtime_stream_async(interval_seconds))
+        except KeyboardInterrupt:
+            logger.info("GTFS-RT processing stopped by user")
     
     def get_recent_data(self, hours: int = 24) -> pd.DataFrame:
         """Get recent real-time data for analysis"""
-        if not self.db_connection:
-            self.create_db_connection()
-        
         query = """
             SELECT * FROM unified_realtime_historical_data
             WHERE timestamp >= NOW() - INTERVAL '%s hours'
@@ -577,7 +728,8 @@ class GTFSRealtimeProcessor:
         """
         
         try:
-            df = pd.read_sql_query(query, self.db_connection, params=(hours,))
+            with self._pool.connection() as conn:
+                df = pd.read_sql_query(query, conn, params=(hours,))
             return df
         except Exception as e:
             logger.error(f"Error fetching recent data: {e}")
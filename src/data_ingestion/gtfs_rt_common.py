@@ -0,0 +1,26 @@
+"""
+Shared GTFS-Realtime Setup
+Protobuf backend selection and feed lookups used by every GTFS-RT module.
+Import this before anything else that imports protobuf.
+"""
+import os
+import logging
+
+# Prefer the upb C extension for feed parsing; must be set before protobuf is imported
+os.environ.setdefault("PROTOCOL_BUFFERS_PYTHON_IMPLEMENTATION", "upb")
+from google.protobuf.internal import api_implementation
+from google.transit import gtfs_realtime_pb2
+
+logger = logging.getLogger(__name__)
+
+if api_implementation.Type() == "python":
+    logger.warning("protobuf is using the pure-Python backend; GTFS-RT parsing will be slow")
+
+# Message class resolved once; each poll only allocates and parses
+FeedMessage = gtfs_realtime_pb2.FeedMessage
+
+# Enum number -> name, built once instead of a descriptor lookup per entity
+VEHICLE_STOP_STATUS_NAMES = {
+    value.number: value.name
+    for value in gtfs_realtime_pb2.VehiclePosition.VehicleStopStatus.DESCRIPTOR.values
+}
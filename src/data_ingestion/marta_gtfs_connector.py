@@ -4,26 +4,75 @@ MARTA GTFS Real-Time Connector
 Production-ready connector for MARTA GTFS feeds
 """
 import os
+import io
+import csv
 import sys
+import zipfile
 import logging
-import requests
-import pandas as pd
 import psycopg2
 from psycopg2 import extras
+from psycopg2.extensions import quote_ident
 from datetime import datetime, timedelta
 import time
-from typing import Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
 import json
 
 # Add src to path
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
 
 from config.settings import settings
+from src.data_ingestion.gtfs_rt_common import FeedMessage, VEHICLE_STOP_STATUS_NAMES
+from src.data_ingestion.common import GTFS_LOAD_LOCK_NAME, ConnectionPool, make_http_session
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Bytes per read when streaming CSV into COPY
+COPY_BUFFER_SIZE = 1 << 20
+
+# Bytes per chunk when streaming the static GTFS download to disk
+DOWNLOAD_CHUNK_SIZE = 1 << 20
+
+# Sent with realtime polls only; the static ZIP download keeps the session defaults
+FEED_REQUEST_HEADERS = {'Accept': 'application/x-protobuf', 'Accept-Encoding': 'gzip, deflate'}
+
+# Batches at least this large are streamed with COPY instead of execute_values
+COPY_THRESHOLD = 1000
+
+# Column order of the GTFS-RT tables written by store_realtime_data
+VEHICLE_POSITION_COLUMNS = [
+    'id', 'trip_id', 'route_id', 'vehicle_id', 'latitude', 'longitude',
+    'bearing', 'speed', 'timestamp', 'current_status'
+]
+TRIP_UPDATE_COLUMNS = [
+    'id', 'trip_id', 'route_id', 'direction_id', 'start_time', 'start_date', 'timestamp',
+    'stop_id', 'stop_sequence', 'arrival_delay', 'arrival_time', 'departure_delay', 'departure_time'
+]
+
+# Static GTFS files to load, in foreign-key order
+GTFS_FILES = {
+    'stops.txt': 'gtfs_stops',
+    'routes.txt': 'gtfs_routes',
+    'trips.txt': 'gtfs_trips',
+    'stop_times.txt': 'gtfs_stop_times'
+}
+
+# Threads (and pooled connections) used to stage static GTFS files concurrently
+GTFS_LOAD_WORKERS = 4
+
+# Tables whose secondary indexes are dropped during the load and rebuilt afterwards
+BULK_LOAD_REINDEX_TABLES = ('gtfs_stop_times',)
+
+# Conflict targets for the static GTFS upserts
+GTFS_PRIMARY_KEYS = {
+    'gtfs_stops': ('stop_id',),
+    'gtfs_routes': ('route_id',),
+    'gtfs_trips': ('trip_id',),
+    'gtfs_stop_times': ('trip_id', 'stop_sequence'),
+}
+
 
 class MARTAGTFSConnector:
     """Production GTFS connector for MARTA data"""
@@ -35,6 +84,14 @@ class MARTAGTFSConnector:
             'user': settings.DB_USER,
             'password': settings.DB_PASSWORD
         }
+        # One connection per staging worker plus the merge connection
+        self._pool = ConnectionPool(minconn=1, maxconn=GTFS_LOAD_WORKERS + 1, **self.db_config)
+        
+        # Merge statements keyed by (table, staged columns); a feed's layout rarely changes
+        self._merge_sql_cache: Dict[Tuple[str, Tuple[str, ...]], str] = {}
+        
+        # Last (latitude, longitude, timestamp) stored per vehicle, to skip idle repeats
+        self._last_vehicle_position: Dict[str, Tuple] = {}
         
         # MARTA API endpoints (replace with actual endpoints)
         self.static_gtfs_url = "https://api.marta.io/gtfs/static/gtfs.zip"
@@ -44,28 +101,88 @@ class MARTAGTFSConnector:
         # API authentication (replace with actual method)
         self.api_key = os.getenv("MARTA_API_KEY")
         self.headers = {"x-api-key": self.api_key} if self.api_key else {}
+        
+        # Keep-alive session so each poll reuses the TCP/TLS connection to the API host
+        self.session = make_http_session(pool_connections=2, pool_maxsize=4, retries=3, headers=self.headers)
+        
+        # The two realtime feeds are independent, so they are fetched side by side
+        self._executor = ThreadPoolExecutor(max_workers=2)
+    
+    def _ensure_connection(self, conn):
+        """Return conn if it still answers, otherwise a fresh pooled connection
+
+        Returns None while the database is unreachable; the caller retries on its next tick.
+        """
+        if conn is not None:
+            try:
+                conn.rollback()
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+                return conn
+            except psycopg2.Error as e:
+                logger.warning(f"Discarding broken database connection: {e}")
+                self._pool.putconn(conn, close=True)
+        try:
+            return self._pool.getconn()
+        except Exception as e:
+            logger.error(f"Database unavailable, retrying on the next poll: {e}")
+            return None
     
     def download_static_gtfs(self) -> bool:
         """Download and process MARTA static GTFS data"""
         try:
             logger.info("Downloading MARTA static GTFS data...")
             
-            # Download GTFS ZIP file
-            response = requests.get(self.static_gtfs_url, headers=self.headers, timeout=30)
-            response.raise_for_status()
-            
-            # Save to temporary file
             temp_file = "data/raw/marta_gtfs_latest.zip"
+            meta_file = "data/raw/marta_gtfs_latest.meta.json"
             os.makedirs(os.path.dirname(temp_file), exist_ok=True)
             
-            with open(temp_file, 'wb') as f:
-                f.write(response.content)
+            # Ask the server to skip the download when the feed hasn't changed since the last load
+            request_headers = {}
+            if os.path.exists(temp_file) and os.path.exists(meta_file):
+                with open(meta_file) as f:
+                    meta = json.load(f)
+                if meta.get('etag'):
+                    request_headers['If-None-Match'] = meta['etag']
+                if meta.get('last_modified'):
+                    request_headers['If-Modified-Since'] = meta['last_modified']
+            
+            # Stream the GTFS ZIP to disk in chunks rather than holding it all in memory
+            downloaded = 0
+            with self.session.get(self.static_gtfs_url, headers=request_headers,
+                                  timeout=30, stream=True) as response:
+                if response.status_code == 304:
+                    logger.info("Static GTFS unchanged since last download; skipping ingestion")
+                    return True
+                response.raise_for_status()
+                with open(temp_file + '.part', 'wb') as f:
+                    # Reserve the full size up front when the body is sent as-is
+                    content_length = int(response.headers.get('Content-Length') or 0)
+                    if content_length and not response.headers.get('Content-Encoding'):
+                        try:
+                            os.posix_fallocate(f.fileno(), 0, content_length)
+                        except (AttributeError, OSError) as e:
+                            logger.debug(f"Could not preallocate {content_length} bytes: {e}")
+                    for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                        f.write(chunk)
+                        downloaded += len(chunk)
+                    # Drop any reserved space the body did not fill
+                    f.truncate()
+                validators = {
+                    'etag': response.headers.get('ETag'),
+                    'last_modified': response.headers.get('Last-Modified')
+                }
+            os.replace(temp_file + '.part', temp_file)
             
-            logger.info(f"Downloaded GTFS data: {len(response.content)} bytes")
+            logger.info(f"Downloaded GTFS data: {downloaded} bytes")
             
             # Process the ZIP file (reuse existing ingestion logic)
             self._process_gtfs_zip(temp_file)
             
+            # Only remember the version once it is fully loaded, so a failed load is retried
+            with open(meta_file, 'w') as f:
+                json.dump(validators, f)
+            
             return True
             
         except Exception as e:
@@ -74,84 +191,165 @@ class MARTAGTFSConnector:
     
     def _process_gtfs_zip(self, zip_path: str):
         """Process downloaded GTFS ZIP file"""
-        import zipfile
-        
         try:
             with zipfile.ZipFile(zip_path, 'r') as zf:
-                # Extract and process each GTFS file
-                gtfs_files = {
-                    'stops.txt': 'gtfs_stops',
-                    'routes.txt': 'gtfs_routes', 
-                    'trips.txt': 'gtfs_trips',
-                    'stop_times.txt': 'gtfs_stop_times'
-                }
+                members = set(zf.namelist())
+                present = [(filename, table_name) for filename, table_name in GTFS_FILES.items()
+                           if filename in members]
                 
-                conn = psycopg2.connect(**self.db_config)
-                
-                for filename, table_name in gtfs_files.items():
-                    if filename in zf.namelist():
-                        logger.info(f"Processing {filename}...")
-                        self._load_gtfs_file(zf, filename, table_name, conn)
-                
-                conn.close()
+                # The merge connection holds the load lock from before staging until the commit
+                with self._pool.connection() as conn:
+                    with conn.cursor() as cursor:
+                        cursor.execute("SELECT pg_advisory_lock(hashtext(%s))", (GTFS_LOAD_LOCK_NAME,))
+                    try:
+                        self._load_gtfs_members(zf, present, conn)
+                    finally:
+                        # Session-level locks outlive a rollback, so release explicitly
+                        conn.rollback()
+                        with conn.cursor() as cursor:
+                            cursor.execute("SELECT pg_advisory_unlock(hashtext(%s))", (GTFS_LOAD_LOCK_NAME,))
+                        conn.commit()
                 
         except Exception as e:
             logger.error(f"Error processing GTFS ZIP: {e}")
             raise
     
-    def _load_gtfs_file(self, zip_file, filename: str, table_name: str, conn):
-        """Load individual GTFS file into database"""
-        try:
-            with zip_file.open(filename) as f:
-                df = pd.read_csv(f)
-                
-                # Convert DataFrame to list of tuples
-                data = [tuple(row) for row in df.values]
-                
-                if not data:
-                    logger.warning(f"No data found in {filename}")
-                    return
-                
-                # Get column names
-                columns = df.columns.tolist()
+    def _load_gtfs_members(self, zf, present: List[Tuple[str, str]], conn):
+        """Stage every present GTFS file in parallel, then merge them all on ``conn``"""
+        # COPY every file into its staging table in parallel, one pooled connection each;
+        # zlib and the COPY socket writes both release the GIL
+        with ThreadPoolExecutor(max_workers=GTFS_LOAD_WORKERS) as executor:
+            futures = {
+                table_name: executor.submit(self._stage_gtfs_file, zf, filename, table_name)
+                for filename, table_name in present
+            }
+            staged_columns = {table_name: future.result() for table_name, future in futures.items()}
+        
+        # Merge in GTFS_FILES order so foreign keys always find their parent rows,
+        # all inside one transaction with a single commit at the end
+        with conn.cursor() as cursor:
+            cursor.execute("SET LOCAL synchronous_commit = OFF")
+            cursor.execute("SET LOCAL maintenance_work_mem = '512MB'")
+            index_definitions = [
+                definition
+                for table_name in BULK_LOAD_REINDEX_TABLES if table_name in staged_columns
+                for definition in self._drop_secondary_indexes(cursor, table_name)
+            ]
+        
+        for filename, table_name in present:
+            self._merge_gtfs_table(filename, table_name, staged_columns[table_name], conn)
+        
+        with conn.cursor() as cursor:
+            for definition in index_definitions:
+                cursor.execute(definition)
+        conn.commit()
+    
+    def _stage_gtfs_file(self, zip_file, filename: str, table_name: str) -> List[str]:
+        """COPY one GTFS file into its staging table and return the columns to merge"""
+        logger.info(f"Processing {filename}...")
+        stage_table = f"stage_{table_name}"
+        with self._pool.connection() as conn:
+            with zip_file.open(filename) as raw, conn.cursor() as cursor:
+                header_line = raw.readline().decode('utf-8-sig')
+                header = [col.strip() for col in next(csv.reader([header_line]), [])]
                 
-                # Prepare INSERT statement
-                cols_str = ', '.join(columns)
-                vals_str = ', '.join(['%s'] * len(columns))
+                # Mirror the file's own header as TEXT columns so every file streams through
+                # COPY untouched; parsing and casting happen server-side in the merge.
+                # UNLOGGED and shared (not TEMP) so a different connection can merge it
+                header_columns = ', '.join(quote_ident(col, cursor) for col in header)
+                stage_columns = ', '.join(f"{quote_ident(col, cursor)} TEXT" for col in header)
+                cursor.execute(f"DROP TABLE IF EXISTS {stage_table}")
+                # stage_row records file order, so the merge keeps the last row of a repeated key
+                cursor.execute(f"CREATE UNLOGGED TABLE {stage_table} ({stage_columns}, stage_row BIGSERIAL)")
+                # The rest of the zip member goes to the server as raw bytes, never decoded in Python
+                cursor.copy_expert(
+                    f"COPY {stage_table} ({header_columns}) FROM STDIN WITH (FORMAT CSV, ENCODING 'UTF8')", raw,
+                    size=COPY_BUFFER_SIZE
+                )
                 
-                # Handle different table schemas
-                if table_name == 'gtfs_stops':
-                    insert_query = f"""
-                        INSERT INTO {table_name} (stop_id, stop_name, stop_lat, stop_lon, zone_id) 
-                        VALUES ({vals_str}) 
-                        ON CONFLICT (stop_id) DO UPDATE SET 
-                        stop_name = EXCLUDED.stop_name,
-                        stop_lat = EXCLUDED.stop_lat,
-                        stop_lon = EXCLUDED.stop_lon,
-                        zone_id = EXCLUDED.zone_id
-                    """
-                elif table_name == 'gtfs_routes':
-                    insert_query = f"""
-                        INSERT INTO {table_name} (route_id, route_short_name, route_long_name, route_type) 
-                        VALUES ({vals_str}) 
-                        ON CONFLICT (route_id) DO UPDATE SET 
-                        route_short_name = EXCLUDED.route_short_name,
-                        route_long_name = EXCLUDED.route_long_name,
-                        route_type = EXCLUDED.route_type
-                    """
-                else:
-                    # Generic upsert for other tables
-                    insert_query = f"INSERT INTO {table_name} ({cols_str}) VALUES ({vals_str})"
+                cursor.execute(f"SELECT * FROM {table_name} LIMIT 0")
+                table_columns = {desc[0] for desc in cursor.description}
+            conn.commit()
+        
+        # Only merge the columns the table knows about
+        return [col for col in header if col in table_columns]
+    
+    def _drop_secondary_indexes(self, cursor, table_name: str) -> List[str]:
+        """Drop a table's non-unique indexes and return the statements that rebuild them"""
+        cursor.execute("""
+            SELECT idx.relname, pg_get_indexdef(idx.oid)
+            FROM pg_index i
+            JOIN pg_class idx ON idx.oid = i.indexrelid
+            WHERE i.indrelid = %s::regclass AND NOT i.indisprimary AND NOT i.indisunique
+        """, (table_name,))
+        indexes = cursor.fetchall()
+        for index_name, _ in indexes:
+            cursor.execute(f"DROP INDEX {quote_ident(index_name, cursor)}")
+        if indexes:
+            logger.info(f"Dropped {len(indexes)} indexes on {table_name} for the bulk load")
+        return [definition for _, definition in indexes]
+    
+    def _merge_sql(self, cursor, table_name: str, columns: List[str]) -> str:
+        """Build (once per table and column set) the statement that upserts a staged file"""
+        cache_key = (table_name, tuple(columns))
+        insert_query = self._merge_sql_cache.get(cache_key)
+        if insert_query is not None:
+            return insert_query
+        
+        stage_table = f"stage_{table_name}"
+        cols_str = ', '.join(columns)
+        cursor.execute("""
+            SELECT attname, format_type(atttypid, atttypmod) FROM pg_attribute
+            WHERE attrelid = %s::regclass AND attnum > 0 AND NOT attisdropped
+        """, (table_name,))
+        column_types = dict(cursor.fetchall())
+        # Staged values are text; empty strings become NULL before the cast
+        select_str = ', '.join(
+            f"NULLIF({col}, '')::{column_types[col]} AS {col}" for col in columns
+        )
+        
+        key_columns = GTFS_PRIMARY_KEYS.get(table_name, ())
+        if key_columns and all(col in columns for col in key_columns):
+            keys_str = ', '.join(key_columns)
+            update_columns = [col for col in columns if col not in key_columns]
+            if update_columns:
+                conflict_action = "DO UPDATE SET " + ', '.join(
+                    f"{col} = EXCLUDED.{col}" for col in update_columns
+                )
+            else:
+                conflict_action = "DO NOTHING"
+            # DISTINCT ON keeps a single row per key so the upsert can't hit a key twice
+            insert_query = f"""
+                INSERT INTO {table_name} ({cols_str})
+                SELECT DISTINCT ON ({keys_str}) {select_str} FROM {stage_table}
+                ORDER BY {keys_str}, stage_row DESC
+                ON CONFLICT ({keys_str}) {conflict_action}
+            """
+        else:
+            insert_query = f"INSERT INTO {table_name} ({cols_str}) SELECT {select_str} FROM {stage_table}"
+        
+        self._merge_sql_cache[cache_key] = insert_query
+        return insert_query
+    
+    def _merge_gtfs_table(self, filename: str, table_name: str, columns: List[str], conn):
+        """Upsert a staged GTFS file into its target table; the caller commits"""
+        if not columns:
+            logger.warning(f"No data found in {filename}")
+            return
+        
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(self._merge_sql(cursor, table_name, columns))
+                loaded = cursor.rowcount
+                cursor.execute(f"TRUNCATE stage_{table_name}")
                 
-                with conn.cursor() as cursor:
-                    extras.execute_values(cursor, insert_query, data, page_size=1000)
-                    conn.commit()
-                    
-                logger.info(f"Loaded {len(data)} records into {table_name}")
+            if loaded:
+                logger.info(f"Loaded {loaded} records into {table_name}")
+            else:
+                logger.warning(f"No data found in {filename}")
                 
         except Exception as e:
             logger.error(f"Error loading {filename}: {e}")
-            conn.rollback()
             raise
     
     def fetch_realtime_data(self) -> Dict:
@@ -163,17 +361,16 @@ class MARTAGTFSConnector:
         }
         
         try:
-            # Fetch vehicle positions
-            logger.info("Fetching vehicle positions...")
-            vp_response = requests.get(self.vehicle_positions_url, headers=self.headers, timeout=10)
-            if vp_response.status_code == 200:
-                realtime_data['vehicle_positions'] = self._parse_vehicle_positions(vp_response.content)
-            
-            # Fetch trip updates
-            logger.info("Fetching trip updates...")
-            tu_response = requests.get(self.trip_updates_url, headers=self.headers, timeout=10)
-            if tu_response.status_code == 200:
-                realtime_data['trip_updates'] = self._parse_trip_updates(tu_response.content)
+            # Fetch and parse both feeds concurrently; each parse starts as soon as its body arrives
+            logger.info("Fetching vehicle positions and trip updates...")
+            vp_future = self._executor.submit(
+                self._fetch_feed, self.vehicle_positions_url, self._parse_vehicle_positions
+            )
+            tu_future = self._executor.submit(
+                self._fetch_feed, self.trip_updates_url, self._parse_trip_updates
+            )
+            realtime_data['vehicle_positions'] = vp_future.result()
+            realtime_data['trip_updates'] = tu_future.result()
             
             logger.info(f"Fetched {len(realtime_data['vehicle_positions'])} vehicle positions, "
                        f"{len(realtime_data['trip_updates'])} trip updates")
@@ -183,65 +380,164 @@ class MARTAGTFSConnector:
         
         return realtime_data
     
-    def _parse_vehicle_positions(self, content: bytes) -> List[Dict]:
-        """Parse vehicle positions from protobuf content"""
-        # This would use google-transit-gtfs-realtime library
-        # For now, return empty list as placeholder
-        return []
+    def _fetch_feed(self, url: str, parser) -> List:
+        """Download one GTFS-RT feed and parse it, returning an empty list on a non-200 reply"""
+        response = self.session.get(url, headers=FEED_REQUEST_HEADERS, timeout=10)
+        if response.status_code != 200:
+            return []
+        return parser(response.content)
+    
+    def _parse_vehicle_positions(self, content: bytes) -> List[Tuple]:
+        """Parse vehicle positions into rows ordered like VEHICLE_POSITION_COLUMNS"""
+        feed = FeedMessage()
+        feed.ParseFromString(content)
+        
+        rows = []
+        for entity in feed.entity:
+            if not entity.HasField('vehicle'):
+                continue
+            vehicle = entity.vehicle
+            trip = vehicle.trip
+            position = vehicle.position
+            rows.append((
+                entity.id,
+                sys.intern(trip.trip_id),
+                sys.intern(trip.route_id),
+                vehicle.vehicle.id,
+                position.latitude,
+                position.longitude,
+                position.bearing,
+                position.speed,
+                datetime.fromtimestamp(vehicle.timestamp) if vehicle.timestamp else None,
+                VEHICLE_STOP_STATUS_NAMES[vehicle.current_status] if vehicle.HasField('current_status') else None
+            ))
+        return rows
     
-    def _parse_trip_updates(self, content: bytes) -> List[Dict]:
-        """Parse trip updates from protobuf content"""
-        # This would use google-transit-gtfs-realtime library
-        # For now, return empty list as placeholder
-        return []
+    def _parse_trip_updates(self, content: bytes) -> List[Tuple]:
+        """Parse trip updates into one row per stop time update, ordered like TRIP_UPDATE_COLUMNS"""
+        feed = FeedMessage()
+        feed.ParseFromString(content)
+        
+        rows = []
+        for entity in feed.entity:
+            if not entity.HasField('trip_update'):
+                continue
+            trip_update = entity.trip_update
+            trip = trip_update.trip
+            trip_fields = (
+                entity.id,
+                sys.intern(trip.trip_id),
+                sys.intern(trip.route_id),
+                trip.direction_id if trip.HasField('direction_id') else None,
+                trip.start_time or None,
+                trip.start_date or None,
+                datetime.fromtimestamp(trip_update.timestamp) if trip_update.timestamp else None,
+            )
+            for stu in trip_update.stop_time_update:
+                arrival = stu.arrival if stu.HasField('arrival') else None
+                departure = stu.departure if stu.HasField('departure') else None
+                rows.append(trip_fields + (
+                    sys.intern(stu.stop_id),
+                    stu.stop_sequence,
+                    arrival.delay if arrival is not None and arrival.HasField('delay') else None,
+                    datetime.fromtimestamp(arrival.time) if arrival is not None and arrival.time else None,
+                    departure.delay if departure is not None and departure.HasField('delay') else None,
+                    datetime.fromtimestamp(departure.time) if departure is not None and departure.time else None,
+                ))
+        return rows
     
-    def store_realtime_data(self, realtime_data: Dict):
-        """Store real-time data in unified_data table"""
+    def store_realtime_data(self, realtime_data: Dict, conn=None):
+        """Store real-time data in the GTFS-RT tables, on conn if given or a pooled connection"""
+        if conn is None:
+            with self._pool.connection() as pooled_conn:
+                return self.store_realtime_data(realtime_data, pooled_conn)
+        
+        last_positions = dict(self._last_vehicle_position)
         try:
-            conn = psycopg2.connect(**self.db_config)
-            
-            # Process vehicle positions
-            for vp in realtime_data['vehicle_positions']:
-                self._store_vehicle_position(vp, conn)
-            
-            # Process trip updates
-            for tu in realtime_data['trip_updates']:
-                self._store_trip_update(tu, conn)
-            
-            conn.close()
+            with conn.cursor() as cursor:
+                self._insert_rows(cursor, 'gtfs_vehicle_positions', VEHICLE_POSITION_COLUMNS,
+                                  self._drop_repeated_positions(realtime_data['vehicle_positions']))
+                self._insert_rows(cursor, 'gtfs_trip_updates', TRIP_UPDATE_COLUMNS,
+                                  realtime_data['trip_updates'])
+            conn.commit()
             
         except Exception as e:
             logger.error(f"Error storing real-time data: {e}")
+            conn.rollback()
+            # Nothing was stored, so don't treat this batch's positions as seen
+            self._last_vehicle_position = last_positions
             raise
     
-    def _store_vehicle_position(self, vp: Dict, conn):
-        """Store individual vehicle position"""
-        # Implementation would depend on actual data structure
-        pass
+    def _drop_repeated_positions(self, rows: List[Tuple]) -> List[Tuple]:
+        """Filter out vehicles whose position and timestamp haven't changed since the last poll"""
+        fresh = []
+        last_seen = self._last_vehicle_position
+        for row in rows:
+            vehicle_id = row[3]
+            key = (row[4], row[5], row[8])
+            if last_seen.get(vehicle_id) != key:
+                last_seen[vehicle_id] = key
+                fresh.append(row)
+        if len(fresh) < len(rows):
+            logger.info(f"Skipped {len(rows) - len(fresh)} unchanged vehicle positions")
+        return fresh
     
-    def _store_trip_update(self, tu: Dict, conn):
-        """Store individual trip update"""
-        # Implementation would depend on actual data structure
-        pass
+    def _insert_rows(self, cursor, table_name: str, columns: List[str], rows: List[Tuple]):
+        """Insert parsed rows in one batch: COPY for large batches, execute_values otherwise"""
+        if not rows:
+            return
+        
+        cols_str = ', '.join(columns)
+        
+        if len(rows) >= COPY_THRESHOLD:
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(rows)
+            buffer.seek(0)
+            cursor.copy_expert(
+                f"COPY {table_name} ({cols_str}) FROM STDIN WITH (FORMAT CSV)", buffer,
+                size=COPY_BUFFER_SIZE
+            )
+        else:
+            extras.execute_values(
+                cursor, f"INSERT INTO {table_name} ({cols_str}) VALUES %s", rows, page_size=1000
+            )
     
     def run_realtime_stream(self, interval_seconds: int = 30):
         """Run continuous real-time data stream"""
         logger.info(f"Starting real-time data stream (interval: {interval_seconds}s)")
         
-        while True:
-            try:
-                realtime_data = self.fetch_realtime_data()
-                self.store_realtime_data(realtime_data)
-                
-                # Wait for next interval
-                time.sleep(interval_seconds)
-                
-            except KeyboardInterrupt:
-                logger.info("Real-time stream stopped by user")
-                break
-            except Exception as e:
-                logger.error(f"Error in real-time stream: {e}")
-                time.sleep(interval_seconds)  # Continue despite errors
+        # Hold one connection for the whole stream instead of reconnecting every tick;
+        # None while the database is unreachable
+        conn = None
+        
+        # Polls are scheduled against fixed deadlines so fetch/store time doesn't stretch the period
+        next_deadline = time.monotonic() + interval_seconds
+        try:
+            while True:
+                try:
+                    if conn is None:
+                        conn = self._ensure_connection(None)
+                    try:
+                        if conn is not None:
+                            realtime_data = self.fetch_realtime_data()
+                            self.store_realtime_data(realtime_data, conn)
+                    except Exception as e:
+                        logger.error(f"Error in real-time stream: {e}")
+                        conn = self._ensure_connection(conn)  # Continue despite errors
+                    
+                    # Wait for next interval; after an overrun, skip the missed slots rather than burst
+                    now = time.monotonic()
+                    if now > next_deadline:
+                        next_deadline += interval_seconds * ((now - next_deadline) // interval_seconds + 1)
+                    time.sleep(next_deadline - now)
+                    next_deadline += interval_seconds
+                    
+                except KeyboardInterrupt:
+                    logger.info("Real-time stream stopped by user")
+                    break
+        finally:
+            if conn is not None:
+                self._pool.putconn(conn)
 
 
 def main():
@@ -8,8 +8,10 @@ import sys
 import logging
 import subprocess
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 import psycopg2
+import psycopg2.errors
 import pandas as pd
 
 # Add src to path
@@ -70,6 +72,30 @@ INGESTION_SCRIPTS = [
     }
 ]
 
+# How much of a failed script's log to surface in the report
+LOG_TAIL_BYTES = 4096
+
+# Tables reported in the data summary
+SUMMARY_TABLES = [
+    'gtfs_stops', 'gtfs_routes', 'gtfs_trips', 'gtfs_stop_times',
+    'gtfs_vehicle_positions', 'gtfs_trip_updates',
+    'marta_ridership_kpi', 'marta_gis_layers',
+    'atlanta_weather_data', 'atlanta_events_data'
+]
+
+# Row estimates from the statistics collector as one JSON object, instead of a COUNT(*) scan
+# per table; partitions are rolled up into their parent (e.g. the daily GTFS-RT partitions)
+SUMMARY_COUNTS_SQL = """
+    SELECT jsonb_object_agg(table_name, live_rows) FROM (
+        SELECT COALESCE(parent.relname, s.relname) AS table_name, SUM(s.n_live_tup) AS live_rows
+        FROM pg_stat_user_tables s
+        LEFT JOIN pg_inherits i ON i.inhrelid = s.relid
+        LEFT JOIN pg_class parent ON parent.oid = i.inhparent
+        WHERE COALESCE(parent.relname, s.relname) = ANY(%s)
+        GROUP BY 1
+    ) counts
+"""
+
 def create_db_connection():
     """Create database connection"""
     try:
@@ -83,19 +109,24 @@ def create_db_connection():
         logging.error(f"Database connection failed: {e}")
         return None
 
-def check_database_status():
-    """Check if database is accessible and has required tables"""
-    conn = create_db_connection()
+def check_database_status(conn=None):
+    """Check if database is accessible and has required tables, on conn if given"""
+    owns_connection = conn is None
+    if owns_connection:
+        conn = create_db_connection()
     if not conn:
         return False
     
     try:
         with conn.cursor() as cursor:
-            # Check if GTFS static tables exist
+            # Check if GTFS static tables exist; pg_class avoids the information_schema joins.
+            # Partitions (the daily GTFS-RT tables and their defaults) are not counted
             cursor.execute("""
-                SELECT table_name FROM information_schema.tables 
-                WHERE table_schema = 'public' AND table_name LIKE 'gtfs_%'
-            """)
+                SELECT c.relname FROM pg_class c
+                JOIN pg_namespace n ON n.oid = c.relnamespace
+                WHERE n.nspname = 'public' AND c.relkind IN ('r', 'p') AND NOT c.relispartition
+                    AND c.relname LIKE %s
+            """, ('gtfs\\_%',))
             gtfs_tables = cursor.fetchall()
             
             if len(gtfs_tables) < 5:  # Should have at least 5 GTFS tables
@@ -109,7 +140,18 @@ def check_database_status():
         logging.error(f"Database status check failed: {e}")
         return False
     finally:
-        conn.close()
+        if owns_connection:
+            conn.close()
+
+def read_log_tail(log_path, max_bytes=LOG_TAIL_BYTES):
+    """Return the last max_bytes of a script log, decoded for reporting"""
+    try:
+        with open(log_path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            f.seek(max(0, f.tell() - max_bytes))
+            return f.read().decode('utf-8', errors='replace')
+    except OSError as e:
+        return f"Could not read {log_path}: {e}"
 
 def run_ingestion_script(script_config):
     """Run a single ingestion script"""
@@ -120,14 +162,18 @@ def run_ingestion_script(script_config):
     logging.info(f"Starting {script_name} ingestion...")
     start_time = time.time()
     
+    # Send the child's output straight to a per-script log file instead of buffering it in memory
+    log_path = os.path.join('logs', f"{os.path.splitext(os.path.basename(script_path))[0]}.log")
+    
     try:
         # Run the script as a subprocess
-        result = subprocess.run(
-            [sys.executable, script_path],
-            capture_output=True,
-            text=True,
-            timeout=timeout
-        )
+        with open(log_path, 'wb') as log_file:
+            result = subprocess.run(
+                [sys.executable, script_path],
+                stdout=log_file,
+                stderr=subprocess.STDOUT,
+                timeout=timeout
+            )
         
         execution_time = time.time() - start_time
         
@@ -136,15 +182,17 @@ def run_ingestion_script(script_config):
             return {
                 'status': 'success',
                 'execution_time': execution_time,
-                'output': result.stdout
+                'log_file': log_path
             }
         else:
+            error_output = read_log_tail(log_path)
             logging.error(f"❌ {script_name} failed with return code {result.returncode}")
-            logging.error(f"Error output: {result.stderr}")
+            logging.error(f"Error output: {error_output}")
             return {
                 'status': 'failed',
                 'execution_time': execution_time,
-                'error': result.stderr
+                'error': error_output,
+                'log_file': log_path
             }
             
     except subprocess.TimeoutExpired:
@@ -152,19 +200,23 @@ def run_ingestion_script(script_config):
         return {
             'status': 'timeout',
             'execution_time': timeout,
-            'error': f'Script timed out after {timeout} seconds'
+            'error': f'Script timed out after {timeout} seconds',
+            'log_file': log_path
         }
     except Exception as e:
         logging.error(f"💥 {script_name} failed with exception: {e}")
         return {
             'status': 'exception',
             'execution_time': time.time() - start_time,
-            'error': str(e)
+            'error': str(e),
+            'log_file': log_path
         }
 
-def generate_data_summary():
-    """Generate a summary of all ingested data"""
-    conn = create_db_connection()
+def generate_data_summary(conn=None):
+    """Generate a summary of all ingested data, on conn if given or a new connection"""
+    owns_connection = conn is None
+    if owns_connection:
+        conn = create_db_connection()
     if not conn:
         return {}
     
@@ -172,51 +224,41 @@ def generate_data_summary():
     
     try:
         with conn.cursor() as cursor:
-            # Count records in each table
-            tables_to_check = [
-                'gtfs_stops', 'gtfs_routes', 'gtfs_trips', 'gtfs_stop_times',
-                'gtfs_vehicle_positions', 'gtfs_trip_updates',
-                'marta_ridership_kpi', 'marta_gis_layers',
-                'atlanta_weather_data', 'atlanta_events_data'
-            ]
-            
-            for table in tables_to_check:
-                try:
-                    cursor.execute(f"SELECT COUNT(*) FROM {table}")
-                    count = cursor.fetchone()[0]
-                    summary[table] = count
-                except Exception:
-                    summary[table] = 0
-            
-            # Get latest timestamps for real-time data
-            try:
-                cursor.execute("SELECT MAX(timestamp) FROM gtfs_vehicle_positions")
-                latest_vp = cursor.fetchone()[0]
-                summary['latest_vehicle_position'] = latest_vp
-            except:
-                summary['latest_vehicle_position'] = None
-                
+            # Table counts and the latest real-time timestamps in a single roundtrip
             try:
-                cursor.execute("SELECT MAX(timestamp) FROM gtfs_trip_updates")
-                latest_tu = cursor.fetchone()[0]
-                summary['latest_trip_update'] = latest_tu
-            except:
-                summary['latest_trip_update'] = None
+                cursor.execute(f"""
+                    SELECT ({SUMMARY_COUNTS_SQL}),
+                        (SELECT MAX(timestamp) FROM gtfs_vehicle_positions),
+                        (SELECT MAX(timestamp) FROM gtfs_trip_updates)
+                """, (SUMMARY_TABLES,))
+                live_rows, latest_vp, latest_tu = cursor.fetchone()
+            except psycopg2.errors.UndefinedTable:
+                # Real-time tables not created yet; counts are still available
+                conn.rollback()
+                cursor.execute(f"SELECT ({SUMMARY_COUNTS_SQL})", (SUMMARY_TABLES,))
+                live_rows, latest_vp, latest_tu = cursor.fetchone()[0], None, None
+            
+            live_rows = live_rows or {}
+            for table in SUMMARY_TABLES:
+                summary[table] = int(live_rows.get(table, 0))
+            summary['latest_vehicle_position'] = latest_vp
+            summary['latest_trip_update'] = latest_tu
                 
     except Exception as e:
         logging.error(f"Error generating data summary: {e}")
     finally:
-        conn.close()
+        if owns_connection:
+            conn.close()
     
     return summary
 
-def print_summary_report(results, data_summary):
-    """Print a comprehensive summary report"""
+def print_summary_report(results, data_summary, total_time):
+    """Print a comprehensive summary report; total_time is the wall-clock time of the whole run"""
     print("\n" + "="*80)
     print("🚇 MARTA DATA INGESTION SUMMARY REPORT")
     print("="*80)
     print(f"📅 Execution Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    print(f"⏱️  Total Execution Time: {sum(r['execution_time'] for r in results):.1f}s")
+    print(f"⏱️  Total Execution Time: {total_time:.1f}s")
     print()
     
     # Script results
@@ -229,7 +271,11 @@ def print_summary_report(results, data_summary):
         if result['status'] == 'success':
             success_count += 1
         if result['status'] != 'success' and 'error' in result:
-            print(f"   Error: {result['error'][:100]}...")
+            # The failing line is at the end of the log tail, not the start
+            lines = result['error'].strip().splitlines()
+            print(f"   Error: {lines[-1][-100:] if lines else ''}")
+            if 'log_file' in result:
+                print(f"   Log: {result['log_file']}")
     
     print(f"\n📈 Success Rate: {success_count}/{len(results)} ({success_count/len(results)*100:.1f}%)")
     
@@ -262,26 +308,48 @@ def main():
     # Create logs directory
     os.makedirs('logs', exist_ok=True)
     
+    # One connection serves both the status check and the final summary; autocommit so it
+    # doesn't sit idle in a transaction while the scripts run
+    conn = create_db_connection()
+    if conn:
+        conn.autocommit = True
+    try:
+        return run_ingestion(conn)
+    finally:
+        if conn:
+            conn.close()
+
+def run_ingestion(conn):
+    """Check the database, run every ingestion script and report the results"""
     # Check database status
-    if not check_database_status():
+    if not conn or not check_database_status(conn):
         logging.error("❌ Database check failed. Please ensure database is running and accessible.")
         return False
     
-    # Run all ingestion scripts
-    results = []
-    for script_config in INGESTION_SCRIPTS:
-        result = run_ingestion_script(script_config)
-        result['script_name'] = script_config['name']
-        results.append(result)
-        
-        # Add delay between scripts to avoid overwhelming external APIs
-        time.sleep(2)
+    # Run all ingestion scripts concurrently; each one talks to a different external API.
+    # The scripts overlap, so the run is timed as a whole rather than summing their times
+    results_by_name = {}
+    start_time = time.time()
+    with ThreadPoolExecutor(max_workers=len(INGESTION_SCRIPTS)) as executor:
+        futures = {
+            executor.submit(run_ingestion_script, script_config): script_config['name']
+            for script_config in INGESTION_SCRIPTS
+        }
+        for future in as_completed(futures):
+            script_name = futures[future]
+            result = future.result()
+            result['script_name'] = script_name
+            results_by_name[script_name] = result
+    total_time = time.time() - start_time
+    
+    # Report in INGESTION_SCRIPTS order regardless of completion order
+    results = [results_by_name[script_config['name']] for script_config in INGESTION_SCRIPTS]
     
     # Generate data summary
-    data_summary = generate_data_summary()
+    data_summary = generate_data_summary(conn)
     
     # Print summary report
-    print_summary_report(results, data_summary)
+    print_summary_report(results, data_summary, total_time)
     
     # Determine overall success
     success_count = sum(1 for r in results if r['status'] == 'success')
@@ -1,10 +1,16 @@
 import os
+import sys
+import io
 import logging
-import requests
 import pandas as pd
-from bs4 import BeautifulSoup
 from datetime import datetime
 import psycopg2
+from psycopg2 import extras
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from src.data_ingestion.common import make_http_session
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -13,6 +19,9 @@ KPI_URL = "https://itsmarta.com/KPIRidership.aspx"
 OUTPUT_CSV = "data/external/marta_ridership_kpi.csv"
 RIDERSHIP_TABLE = "marta_ridership_kpi"
 
+# Shared session for the KPI page
+HTTP_SESSION = make_http_session()
+
 # Database connection details (set as environment variables)
 DB_HOST = os.getenv("DB_HOST", "localhost")
 DB_NAME = os.getenv("DB_NAME", "marta_db")
@@ -21,7 +30,7 @@ DB_PASSWORD = os.getenv("DB_PASSWORD", "marta_password")
 
 CREATE_RIDERSHIP_TABLE = f'''
 CREATE TABLE IF NOT EXISTS {RIDERSHIP_TABLE} (
-    report_month TEXT,
+    report_month TEXT PRIMARY KEY,
     bus_ridership BIGINT,
     rail_ridership BIGINT,
     mobility_ridership BIGINT,
@@ -29,6 +38,10 @@ CREATE TABLE IF NOT EXISTS {RIDERSHIP_TABLE} (
 );
 '''
 
+# Column order of the ridership table; every column but the month is a count
+RIDERSHIP_COLUMNS = ['report_month', 'bus_ridership', 'rail_ridership', 'mobility_ridership', 'total_ridership']
+RIDERSHIP_COUNT_COLUMNS = RIDERSHIP_COLUMNS[1:]
+
 def create_db_connection():
     return psycopg2.connect(host=DB_HOST, database=DB_NAME, user=DB_USER, password=DB_PASSWORD)
 
@@ -40,11 +53,10 @@ def setup_table(conn):
 
 def scrape_kpi_table():
     logging.info(f"Fetching KPI page: {KPI_URL}")
-    response = requests.get(KPI_URL, timeout=15)
+    response = HTTP_SESSION.get(KPI_URL, timeout=15)
     response.raise_for_status()
-    soup = BeautifulSoup(response.content, 'html.parser')
-    # Find all tables on the page
-    tables = pd.read_html(response.text)
+    # Parse the page once, keeping only tables that mention bus ridership
+    tables = pd.read_html(io.BytesIO(response.content), match='(?i)bus')
     # Heuristic: Find the table with 'Bus', 'Rail', 'Mobility', 'Total' columns
     for table in tables:
         cols = [c.lower() for c in table.columns.astype(str)]
@@ -76,25 +88,25 @@ def scrape_kpi_table():
     return df
 
 def store_to_db(df):
+    # Vectorized cleanup instead of per-row `or 0` coercion
+    df = df.reindex(columns=RIDERSHIP_COLUMNS)
+    df = df.drop_duplicates(subset='report_month', keep='last')
+    df[RIDERSHIP_COUNT_COLUMNS] = (
+        df[RIDERSHIP_COUNT_COLUMNS].apply(pd.to_numeric, errors='coerce').fillna(0).astype('int64')
+    )
+    df['report_month'] = df['report_month'].astype(str)
     conn = create_db_connection()
     setup_table(conn)
     with conn.cursor() as cursor:
-        for _, row in df.iterrows():
-            cursor.execute(f'''
-                INSERT INTO {RIDERSHIP_TABLE} (report_month, bus_ridership, rail_ridership, mobility_ridership, total_ridership)
-                VALUES (%s, %s, %s, %s, %s)
-                ON CONFLICT (report_month) DO UPDATE SET
-                    bus_ridership=EXCLUDED.bus_ridership,
-                    rail_ridership=EXCLUDED.rail_ridership,
-                    mobility_ridership=EXCLUDED.mobility_ridership,
-                    total_ridership=EXCLUDED.total_ridership;
-            ''', (
-                row.get('report_month'),
-                int(row.get('bus_ridership', 0) or 0),
-                int(row.get('rail_ridership', 0) or 0),
-                int(row.get('mobility_ridership', 0) or 0),
-                int(row.get('total_ridership', 0) or 0)
-            ))
+        extras.execute_values(cursor, f'''
+            INSERT INTO {RIDERSHIP_TABLE} (report_month, bus_ridership, rail_ridership, mobility_ridership, total_ridership)
+            VALUES %s
+            ON CONFLICT (report_month) DO UPDATE SET
+                bus_ridership=EXCLUDED.bus_ridership,
+                rail_ridership=EXCLUDED.rail_ridership,
+                mobility_ridership=EXCLUDED.mobility_ridership,
+                total_ridership=EXCLUDED.total_ridership;
+        ''', df.itertuples(index=False, name=None))
         conn.commit()
         logging.info(f"Inserted/updated {len(df)} rows in {RIDERSHIP_TABLE}.")
     conn.close()
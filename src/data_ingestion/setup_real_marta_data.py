@@ -8,42 +8,83 @@ import sys
 import logging
 import requests
 import zipfile
+import hashlib
+import tempfile
 import io
 
 # Add src to path
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
 
 from config.settings import settings
+from src.data_ingestion.common import make_http_session
 from src.data_ingestion.gtfs_ingestor import GTFSIngestor
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Bytes per chunk when streaming the GTFS download to disk
+DOWNLOAD_CHUNK_SIZE = 1 << 20
+
+# Largest archive setup_in_memory keeps in RAM before spilling to a temp file
+SPOOLED_ZIP_MAX_SIZE = 64 << 20
+
 class RealMARTADataSetup:
     """Handles the setup of real MARTA data"""
 
     def __init__(self):
         self.gtfs_zip_url = "https://www.itsmarta.com/google_transit_feed/google_transit.zip"
         self.gtfs_zip_path = os.path.join(settings.RAW_DATA_DIR, "gtfs_static", "google_transit.zip")
+        # SHA-256 of the last downloaded archive
+        self.gtfs_zip_sha256 = None
+        
+        self.session = make_http_session()
 
     def download_real_gtfs_data(self):
         """Downloads the real MARTA GTFS data"""
         logger.info(f"Downloading real MARTA GTFS data from {self.gtfs_zip_url}...")
         try:
-            response = requests.get(self.gtfs_zip_url)
-            response.raise_for_status()
-
             os.makedirs(os.path.dirname(self.gtfs_zip_path), exist_ok=True)
+            # Stream the archive to disk; ZipFile then reads the central directory from the file
             with open(self.gtfs_zip_path, "wb") as f:
-                f.write(response.content)
+                self.gtfs_zip_sha256 = self._stream_gtfs_zip(f)
 
-            logger.info(f"Successfully downloaded real MARTA GTFS data to {self.gtfs_zip_path}")
+            logger.info(f"Successfully downloaded real MARTA GTFS data to {self.gtfs_zip_path} "
+                        f"(sha256 {self.gtfs_zip_sha256})")
             return self.gtfs_zip_path
         except requests.exceptions.RequestException as e:
             logger.error(f"Failed to download real MARTA GTFS data: {e}")
             raise
 
+    def _stream_gtfs_zip(self, f, preallocate=True):
+        """Stream the feed archive into ``f`` and return its SHA-256"""
+        digest = hashlib.sha256()
+        with self.session.get(self.gtfs_zip_url, stream=True, timeout=30) as response:
+            response.raise_for_status()
+            if preallocate:
+                self._preallocate(f, response)
+            # Checksum the chunks as they are written, so verifying needs no second read
+            for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                digest.update(chunk)
+                f.write(chunk)
+        if preallocate:
+            # Drop any reserved space the body did not fill
+            f.truncate()
+        return digest.hexdigest()
+
+    @staticmethod
+    def _preallocate(f, response):
+        """Reserve the archive's full size up front so the filesystem lays it out in one extent"""
+        # A content-encoded body's length says nothing about the decoded size
+        length = int(response.headers.get("Content-Length") or 0)
+        if not length or response.headers.get("Content-Encoding"):
+            return
+        try:
+            os.posix_fallocate(f.fileno(), 0, length)
+        except (AttributeError, OSError) as e:
+            # Not available on every platform or filesystem; the copy works without it
+            logger.debug(f"Could not preallocate {length} bytes: {e}")
+
     def setup(self):
         """Downloads and ingests the real MARTA GTFS data"""
         try:
@@ -55,6 +96,22 @@ class RealMARTADataSetup:
             logger.error(f"Failed to setup real MARTA data: {e}")
             raise
 
+    def setup_in_memory(self):
+        """Downloads and ingests the real MARTA GTFS data without saving the archive"""
+        logger.info(f"Streaming real MARTA GTFS data from {self.gtfs_zip_url}...")
+        try:
+            # The archive stays in memory up to SPOOLED_ZIP_MAX_SIZE, then spills to an anonymous temp file
+            with tempfile.SpooledTemporaryFile(max_size=SPOOLED_ZIP_MAX_SIZE) as buffer:
+                # No preallocation: asking for a file descriptor would force the spill to disk
+                self.gtfs_zip_sha256 = self._stream_gtfs_zip(buffer, preallocate=False)
+                buffer.seek(0)
+                ingestor = GTFSIngestor()
+                ingestor.ingest_gtfs_static(buffer)
+            logger.info(f"Successfully ingested real MARTA GTFS data (sha256 {self.gtfs_zip_sha256}) into the database")
+        except Exception as e:
+            logger.error(f"Failed to setup real MARTA data: {e}")
+            raise
+
 if __name__ == "__main__":
     setup = RealMARTADataSetup()
     setup.setup()
@@ -5,11 +5,12 @@ Creates realistic demo data for MARTA Demand Forecasting Platform
 """
 import os
 import sys
+import io
 import logging
 import pandas as pd
 import psycopg2
 from psycopg2 import extras
-from datetime import datetime, timedelta
+from datetime import datetime
 import numpy as np
 from typing import Dict, List
 
@@ -22,6 +23,22 @@ from config.settings import settings
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Columns of the demo unified_realtime_historical_data rows, in generation order
+DEMO_UNIFIED_COLUMNS = [
+    'timestamp', 'trip_id', 'stop_id', 'route_id', 'vehicle_id', 'latitude', 'longitude',
+    'scheduled_arrival_time', 'actual_arrival_time', 'delay_minutes', 'inferred_dwell_time_seconds',
+    'inferred_demand_level', 'weather_condition', 'temperature_celsius', 'event_flag',
+    'day_of_week', 'hour_of_day', 'is_weekend'
+]
+
+# Demo weather mix and its sampling weights
+WEATHER_CONDITIONS = ['Clear', 'Cloudy', 'Rainy', 'Sunny']
+WEATHER_PROBABILITIES = [0.4, 0.3, 0.2, 0.1]
+
+# Dwell-time thresholds in seconds and the demand level above each one
+DEMAND_LEVEL_THRESHOLDS = np.array([30, 60, 120])
+DEMAND_LEVELS = np.array(['Low', 'Normal', 'High', 'Overloaded'])
+
 
 class SimpleGTFSIngestion:
     """Simplified GTFS ingestion for demo purposes"""
@@ -31,8 +48,15 @@ class SimpleGTFSIngestion:
             'host': settings.DB_HOST,
             'database': settings.DB_NAME,
             'user': settings.DB_USER,
-            'password': settings.DB_PASSWORD
+            'password': settings.DB_PASSWORD,
+            # Keep the connection alive while the demo week is generated between COPYs
+            'keepalives': 1,
+            'keepalives_idle': 30,
+            'keepalives_interval': 10,
+            'keepalives_count': 5
         }
+        # One generator for all demo draws, seeded so repeated runs build the same data
+        self._rng = np.random.default_rng(settings.RANDOM_SEED)
     
     def create_demo_data(self):
         """Create comprehensive demo data for the platform"""
@@ -41,22 +65,33 @@ class SimpleGTFSIngestion:
         try:
             conn = psycopg2.connect(**self.db_config)
             
-            # Create demo stops (major MARTA stations)
-            self._create_demo_stops(conn)
-            
-            # Create demo routes (major MARTA routes)
-            self._create_demo_routes(conn)
-            
-            # Create demo trips
-            self._create_demo_trips(conn)
-            
-            # Create demo stop times
-            self._create_demo_stop_times(conn)
-            
-            # Create demo unified data (simulated real-time + historical)
-            self._create_demo_unified_data(conn)
-            
-            conn.close()
+            # Every demo table is loaded in one transaction and committed once at the end
+            try:
+                # Demo data can be regenerated, so skip waiting on the WAL flush at commit
+                with conn.cursor() as cursor:
+                    cursor.execute("SET LOCAL synchronous_commit = off")
+                
+                # Create demo stops (major MARTA stations)
+                self._create_demo_stops(conn)
+                
+                # Create demo routes (major MARTA routes)
+                self._create_demo_routes(conn)
+                
+                # Create demo trips
+                self._create_demo_trips(conn)
+                
+                # Create demo stop times
+                self._create_demo_stop_times(conn)
+                
+                # Create demo unified data (simulated real-time + historical)
+                self._create_demo_unified_data(conn)
+                
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                conn.close()
             logger.info("Demo data creation completed successfully!")
             
         except Exception as e:
@@ -87,9 +122,9 @@ class SimpleGTFSIngestion:
             extras.execute_values(
                 cursor,
                 "INSERT INTO gtfs_stops (stop_id, stop_name, stop_lat, stop_lon, zone_id) VALUES %s ON CONFLICT (stop_id) DO NOTHING",
-                stops_data
+                stops_data,
+                page_size=1000
             )
-            conn.commit()
             logger.info(f"Created {len(stops_data)} demo stops")
     
     def _create_demo_routes(self, conn):
@@ -108,9 +143,9 @@ class SimpleGTFSIngestion:
             extras.execute_values(
                 cursor,
                 "INSERT INTO gtfs_routes (route_id, route_short_name, route_long_name, route_type) VALUES %s ON CONFLICT (route_id) DO NOTHING",
-                routes_data
+                routes_data,
+                page_size=1000
             )
-            conn.commit()
             logger.info(f"Created {len(routes_data)} demo routes")
     
     def _create_demo_trips(self, conn):
@@ -130,142 +165,181 @@ class SimpleGTFSIngestion:
             extras.execute_values(
                 cursor,
                 "INSERT INTO gtfs_trips (trip_id, route_id, service_id, direction_id) VALUES %s ON CONFLICT (trip_id) DO NOTHING",
-                trips_data
+                trips_data,
+                page_size=1000
             )
-            conn.commit()
             logger.info(f"Created {len(trips_data)} demo trips")
     
     def _create_demo_stop_times(self, conn):
         """Create demo stop times for trips"""
-        # Get all trips and stops
-        trips_df = pd.read_sql("SELECT trip_id, route_id FROM gtfs_trips LIMIT 100", conn)
-        stops_df = pd.read_sql("SELECT stop_id FROM gtfs_stops", conn)
+        # Get all trips and stops as two arrays in a single round trip
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                SELECT
+                    (SELECT array_agg(trip_id) FROM (SELECT trip_id FROM gtfs_trips LIMIT 100) t),
+                    (SELECT array_agg(stop_id) FROM gtfs_stops)
+            """)
+            trip_ids, stop_ids = (np.array(ids or []) for ids in cursor.fetchone())
         
-        stop_times_data = []
+        # Assign 5-8 stops per trip
+        num_stops = np.minimum(self._rng.integers(5, 9, len(trip_ids)), len(stop_ids))
         
-        for _, trip in trips_df.iterrows():
-            # Assign 5-8 stops per trip
-            num_stops = np.random.randint(5, 9)
-            selected_stops = stops_df.sample(n=num_stops)['stop_id'].tolist()
-            
-            base_time = datetime.now().replace(hour=6, minute=0, second=0, microsecond=0)
-            
-            for i, stop_id in enumerate(selected_stops):
-                arrival_time = base_time + timedelta(minutes=i*10)
-                departure_time = arrival_time + timedelta(minutes=2)
-                
-                stop_times_data.append((
-                    trip['trip_id'],
-                    stop_id,
-                    i + 1,
-                    arrival_time.time(),
-                    departure_time.time()
-                ))
+        # Sample every trip's stops at once: shuffle each row of stop indices, keep the first num_stops
+        shuffled = self._rng.permuted(np.tile(np.arange(len(stop_ids)), (len(trip_ids), 1)), axis=1)
+        trip_idx, position = np.nonzero(np.arange(len(stop_ids)) < num_stops[:, None])
         
+        # Stops are 10 minutes apart from 06:00, with a 2 minute dwell
+        base_time = pd.Timestamp(datetime.now().replace(hour=6, minute=0, second=0, microsecond=0))
+        arrival_times = base_time + pd.to_timedelta(position * 10, unit='m')
+        departure_times = arrival_times + pd.Timedelta(minutes=2)
+        
+        stop_times_df = pd.DataFrame({
+            'trip_id': trip_ids[trip_idx],
+            'stop_id': stop_ids[shuffled[trip_idx, position]],
+            'stop_sequence': position + 1,
+            'arrival_time': arrival_times.strftime('%H:%M:%S'),
+            'departure_time': departure_times.strftime('%H:%M:%S'),
+        })
+        
+        buffer = io.StringIO()
+        stop_times_df.to_csv(buffer, header=False, index=False)
+        buffer.seek(0)
+        columns = ', '.join(stop_times_df.columns)
         with conn.cursor() as cursor:
-            extras.execute_values(
-                cursor,
-                "INSERT INTO gtfs_stop_times (trip_id, stop_id, stop_sequence, arrival_time, departure_time) VALUES %s",
-                stop_times_data
-            )
-            conn.commit()
-            logger.info(f"Created {len(stop_times_data)} demo stop times")
+            # COPY into a stage table and merge, so a rerun skips stop times already
+            # seeded instead of failing the whole seed transaction on the primary key
+            cursor.execute("""
+                CREATE TEMP TABLE IF NOT EXISTS stage_demo_stop_times
+                (LIKE gtfs_stop_times INCLUDING DEFAULTS)
+                ON COMMIT DROP
+            """)
+            cursor.copy_expert(f"COPY stage_demo_stop_times ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+            cursor.execute(f"""
+                INSERT INTO gtfs_stop_times ({columns})
+                SELECT {columns} FROM stage_demo_stop_times
+                ON CONFLICT (trip_id, stop_sequence) DO NOTHING
+            """)
+            logger.info(f"Created {cursor.rowcount} demo stop times")
     
     def _create_demo_unified_data(self, conn):
         """Create demo unified data (simulated real-time + historical)"""
-        # Generate 7 days of historical data
-        start_date = datetime.now() - timedelta(days=7)
-        end_date = datetime.now()
+        # Generate 7 days of historical data, one timestamp per hour. Hours are
+        # floored so a rerun produces the same timestamps for the overlapping days
+        end_date = pd.Timestamp.now().floor('h')
+        start_date = end_date - pd.Timedelta(days=7)
+        hours = pd.date_range(start_date, end_date, freq='h')
         
-        unified_data = []
+        # Sample trips paired with every stop, built by the database in one query
+        pairs_df = pd.read_sql("""
+            SELECT t.trip_id, t.route_id, s.stop_id, s.stop_lat, s.stop_lon
+            FROM (SELECT trip_id, route_id FROM gtfs_trips ORDER BY trip_id LIMIT 50) t
+            CROSS JOIN gtfs_stops s
+            ORDER BY t.trip_id, s.stop_id
+        """, conn)
         
-        # Get sample trips and stops
-        trips_df = pd.read_sql("SELECT trip_id, route_id FROM gtfs_trips LIMIT 50", conn)
-        stops_df = pd.read_sql("SELECT stop_id, stop_lat, stop_lon FROM gtfs_stops", conn)
+        # COPY one simulated day at a time into a session-private stage table, so
+        # only a day's rows are ever in memory and reruns skip rows already stored
+        num_rows = 0
+        columns = ', '.join(DEMO_UNIFIED_COLUMNS)
+        copy_sql = f"COPY stage_demo_unified ({columns}) FROM STDIN WITH (FORMAT csv)"
+        merge_sql = f"""
+            INSERT INTO unified_realtime_historical_data ({columns})
+            SELECT {columns} FROM stage_demo_unified
+            ON CONFLICT DO NOTHING
+        """
+        with conn.cursor() as cursor:
+            # Natural key for the dedup; rows already duplicated by older loads make the
+            # build fail, so it runs under a savepoint instead of aborting the whole seed
+            cursor.execute("SAVEPOINT demo_unified_index")
+            try:
+                cursor.execute("""
+                    CREATE UNIQUE INDEX IF NOT EXISTS uq_unified_trip_stop_key
+                    ON unified_realtime_historical_data (COALESCE(trip_id, ''), COALESCE(stop_id, ''), timestamp)
+                """)
+                cursor.execute("RELEASE SAVEPOINT demo_unified_index")
+            except psycopg2.Error as e:
+                cursor.execute("ROLLBACK TO SAVEPOINT demo_unified_index")
+                logger.warning(f"Could not create unique index on unified data (existing duplicates?): {e}")
+            cursor.execute("""
+                CREATE TEMP TABLE IF NOT EXISTS stage_demo_unified
+                (LIKE unified_realtime_historical_data INCLUDING DEFAULTS)
+                ON COMMIT DROP
+            """)
+            for day_df in self._iter_demo_unified_days(pairs_df, hours):
+                buffer = io.StringIO()
+                day_df.to_csv(buffer, header=False, index=False, date_format='%Y-%m-%d %H:%M:%S.%f')
+                buffer.seek(0)
+                cursor.copy_expert(copy_sql, buffer)
+                cursor.execute(merge_sql)
+                num_rows += cursor.rowcount
+                cursor.execute("TRUNCATE stage_demo_unified")
         
-        current_time = start_date
+        logger.info(f"Created {num_rows} demo unified data records")
+    
+    def _iter_demo_unified_days(self, pairs_df: pd.DataFrame, hours: pd.DatetimeIndex):
+        """Yield one DataFrame of demo unified rows per 24 hours of ``hours``"""
+        num_pairs = len(pairs_df)
+        trip_ids = pairs_df['trip_id'].to_numpy()
+        route_ids = pairs_df['route_id'].to_numpy()
+        stop_ids = pairs_df['stop_id'].to_numpy()
+        lats = pairs_df['stop_lat'].to_numpy(dtype=float)
+        lons = pairs_df['stop_lon'].to_numpy(dtype=float)
         
-        while current_time <= end_date:
-            for _, trip in trips_df.iterrows():
-                for _, stop in stops_df.iterrows():
-                    # Simulate realistic demand patterns
-                    hour = current_time.hour
-                    day_of_week = current_time.strftime('%A')
-                    is_weekend = current_time.weekday() >= 5
-                    
-                    # Base demand varies by time and day
-                    base_demand = 20
-                    if 7 <= hour <= 9 or 17 <= hour <= 19:  # Rush hours
-                        base_demand = 80
-                    elif is_weekend:
-                        base_demand = 40
-                    
-                    # Add randomness
-                    dwell_time = np.random.poisson(base_demand * 0.5) + 30  # 30 seconds minimum
-                    
-                    # Simulate weather impact
-                    weather_conditions = ['Clear', 'Cloudy', 'Rainy', 'Sunny']
-                    weather = np.random.choice(weather_conditions, p=[0.4, 0.3, 0.2, 0.1])
-                    
-                    # Temperature varies by season
-                    temperature = np.random.normal(20, 10)  # 20°C average, 10°C std
-                    
-                    # Event flag (5% chance of major event)
-                    event_flag = np.random.random() < 0.05
-                    
-                    # Delay simulation
-                    delay = np.random.normal(2, 5)  # 2 min average delay, 5 min std
-                    
-                    # Demand level classification
-                    if dwell_time > 120:
-                        demand_level = 'Overloaded'
-                    elif dwell_time > 60:
-                        demand_level = 'High'
-                    elif dwell_time > 30:
-                        demand_level = 'Normal'
-                    else:
-                        demand_level = 'Low'
-                    
-                    unified_data.append((
-                        current_time,
-                        trip['trip_id'],
-                        stop['stop_id'],
-                        trip['route_id'],
-                        f"VEH_{np.random.randint(1000, 9999)}",
-                        stop['stop_lat'] + np.random.normal(0, 0.001),  # Add GPS noise
-                        stop['stop_lon'] + np.random.normal(0, 0.001),
-                        current_time - timedelta(minutes=5),  # Scheduled arrival
-                        current_time + timedelta(seconds=delay*60),  # Actual arrival
-                        delay,
-                        dwell_time,
-                        demand_level,
-                        weather,
-                        temperature,
-                        event_flag,
-                        day_of_week,
-                        hour,
-                        is_weekend
-                    ))
+        for day_start in range(0, len(hours), 24):
+            day_hours = hours[day_start:day_start + 24]
+            n = len(day_hours) * num_pairs
             
-            current_time += timedelta(hours=1)
-        
-        # Insert in batches
-        batch_size = 1000
-        for i in range(0, len(unified_data), batch_size):
-            batch = unified_data[i:i+batch_size]
-            with conn.cursor() as cursor:
-                extras.execute_values(
-                    cursor,
-                    """INSERT INTO unified_realtime_historical_data 
-                    (timestamp, trip_id, stop_id, route_id, vehicle_id, latitude, longitude,
-                     scheduled_arrival_time, actual_arrival_time, delay_minutes, inferred_dwell_time_seconds,
-                     inferred_demand_level, weather_condition, temperature_celsius, event_flag,
-                     day_of_week, hour_of_day, is_weekend) VALUES %s""",
-                    batch
-                )
-                conn.commit()
-        
-        logger.info(f"Created {len(unified_data)} demo unified data records")
+            # Every (hour, trip, stop) combination: hours vary slowest, then trips, then stops,
+            # matching the order of the original nested loops
+            timestamps = day_hours.repeat(num_pairs)
+            
+            # Calendar fields come from the DatetimeIndex accessors, once per hour
+            hour_of_day = day_hours.hour.to_numpy()
+            is_weekend = day_hours.weekday.to_numpy() >= 5
+            day_of_week = day_hours.day_name().to_numpy()
+            
+            # Base demand varies by time and day
+            is_rush_hour = ((hour_of_day >= 7) & (hour_of_day <= 9)) | ((hour_of_day >= 17) & (hour_of_day <= 19))
+            base_demand = np.where(is_rush_hour, 80, np.where(is_weekend, 40, 20))
+            
+            dwell_time = self._rng.poisson(np.repeat(base_demand, num_pairs) * 0.5) + 30  # 30 seconds minimum
+            
+            # Simulate weather impact
+            weather = self._rng.choice(WEATHER_CONDITIONS, size=n, p=WEATHER_PROBABILITIES)
+            
+            # Temperature varies by season
+            temperature = self._rng.normal(20, 10, n)  # 20°C average, 10°C std
+            
+            # Event flag (5% chance of major event)
+            event_flag = self._rng.random(n) < 0.05
+            
+            # Delay simulation
+            delay = self._rng.normal(2, 5, n)  # 2 min average delay, 5 min std
+            
+            # Demand level classification: a dwell time above a threshold moves up one level
+            demand_level = DEMAND_LEVELS[np.searchsorted(DEMAND_LEVEL_THRESHOLDS, dwell_time, side='left')]
+            
+            yield pd.DataFrame({
+                'timestamp': timestamps,
+                'trip_id': np.tile(trip_ids, len(day_hours)),
+                'stop_id': np.tile(stop_ids, len(day_hours)),
+                'route_id': np.tile(route_ids, len(day_hours)),
+                # Four-digit vehicle numbers, formatted as fixed-width strings in one NumPy pass
+                'vehicle_id': np.char.add('VEH_', self._rng.integers(1000, 9999, n).astype('U4')),
+                'latitude': np.tile(lats, len(day_hours)) + self._rng.normal(0, 0.001, n),  # Add GPS noise
+                'longitude': np.tile(lons, len(day_hours)) + self._rng.normal(0, 0.001, n),
+                'scheduled_arrival_time': timestamps - pd.Timedelta(minutes=5),
+                'actual_arrival_time': timestamps + pd.to_timedelta(delay, unit='m'),
+                'delay_minutes': delay,
+                'inferred_dwell_time_seconds': dwell_time,
+                'inferred_demand_level': demand_level,
+                'weather_condition': weather,
+                'temperature_celsius': temperature,
+                'event_flag': event_flag,
+                'day_of_week': np.repeat(day_of_week, num_pairs),
+                'hour_of_day': np.repeat(hour_of_day, num_pairs),
+                'is_weekend': np.repeat(is_weekend, num_pairs),
+            }, columns=DEMO_UNIFIED_COLUMNS)
 
 
 if __name__ == "__main__":
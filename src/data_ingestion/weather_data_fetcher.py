@@ -1,12 +1,18 @@
 import os
+import sys
 import logging
-import requests
-import pandas as pd
 import psycopg2
+from psycopg2 import extras
 from datetime import datetime, timedelta
-import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 import json
 
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from src.data_ingestion.common import make_http_session
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -15,10 +21,21 @@ OPENWEATHER_API_KEY = os.getenv("OPENWEATHER_API_KEY", "YOUR_OPENWEATHER_API_KEY
 ATLANTA_LAT = 33.7490
 ATLANTA_LON = -84.3880
 
+# Shared session for OpenWeatherMap
+HTTP_SESSION = make_http_session()
+
 # API Endpoints
 CURRENT_WEATHER_URL = "https://api.openweathermap.org/data/2.5/weather"
 HISTORICAL_WEATHER_URL = "https://api.openweathermap.org/data/2.5/onecall/timemachine"
 
+# Historical days requested at once; rate-limit replies are paced by the session's Retry-After handling
+HISTORICAL_FETCH_CONCURRENCY = 5
+# Long-lived workers for the blocking HTTP_SESSION calls, shared by every asyncio.run in this module;
+# one slot more than the historical fan-out so the current-weather call never queues behind it
+FETCH_EXECUTOR = ThreadPoolExecutor(max_workers=HISTORICAL_FETCH_CONCURRENCY + 1)
+# Request starts are spaced to stay within OpenWeatherMap's free-tier quota
+HISTORICAL_REQUESTS_PER_MINUTE = 60
+
 OUTPUT_CSV = "data/external/atlanta_weather_data.csv"
 WEATHER_TABLE = "atlanta_weather_data"
 
@@ -31,7 +48,7 @@ DB_PASSWORD = os.getenv("DB_PASSWORD", "marta_password")
 CREATE_WEATHER_TABLE = f'''
 CREATE TABLE IF NOT EXISTS {WEATHER_TABLE} (
     id SERIAL PRIMARY KEY,
-    timestamp TIMESTAMP,
+    timestamp TIMESTAMP UNIQUE,
     temperature_celsius NUMERIC,
     feels_like_celsius NUMERIC,
     humidity INTEGER,
@@ -47,8 +64,28 @@ CREATE TABLE IF NOT EXISTS {WEATHER_TABLE} (
 );
 '''
 
+# Column order of the weather table; the timestamp is the upsert key
+WEATHER_COLUMNS = [
+    'timestamp', 'temperature_celsius', 'feels_like_celsius', 'humidity',
+    'pressure_hpa', 'wind_speed_mps', 'wind_direction_degrees',
+    'weather_condition', 'weather_description', 'precipitation_mm',
+    'visibility_meters', 'cloudiness_percent'
+]
+
+# Upsert statement and row template, rendered once at import rather than on every store
+UPSERT_WEATHER_SQL = f'''
+    INSERT INTO {WEATHER_TABLE} ({', '.join(WEATHER_COLUMNS)})
+    VALUES %s
+    ON CONFLICT (timestamp) DO UPDATE SET
+        {', '.join(f"{col} = EXCLUDED.{col}" for col in WEATHER_COLUMNS[1:])},
+        created_at = CURRENT_TIMESTAMP;
+'''
+WEATHER_ROW_TEMPLATE = "(" + ", ".join(["%s"] * len(WEATHER_COLUMNS)) + ")"
+
 def create_db_connection():
-    return psycopg2.connect(host=DB_HOST, database=DB_NAME, user=DB_USER, password=DB_PASSWORD)
+    # TCP keepalives stop an idle connection being silently dropped during a long backfill
+    return psycopg2.connect(host=DB_HOST, database=DB_NAME, user=DB_USER, password=DB_PASSWORD,
+                            keepalives=1, keepalives_idle=30, keepalives_interval=10, keepalives_count=5)
 
 def setup_weather_table(conn):
     with conn.cursor() as cursor:
@@ -56,6 +93,17 @@ def setup_weather_table(conn):
         conn.commit()
         logging.info(f"Ensured weather table {WEATHER_TABLE} exists.")
 
+def fetch_stored_weather_dates(conn, days_back=5):
+    """Past dates whose full day of hourly records is already in the weather table"""
+    with conn.cursor() as cursor:
+        cursor.execute(f"""
+            SELECT timestamp::date FROM {WEATHER_TABLE}
+            WHERE timestamp >= %s AND timestamp < CURRENT_DATE
+            GROUP BY timestamp::date
+            HAVING COUNT(*) >= 24
+        """, (datetime.now().date() - timedelta(days=days_back),))
+        return {row[0] for row in cursor.fetchall()}
+
 def fetch_current_weather():
     logging.info("Fetching current weather data")
     
@@ -67,7 +115,7 @@ def fetch_current_weather():
     }
     
     try:
-        response = requests.get(CURRENT_WEATHER_URL, params=params, timeout=10)
+        response = HTTP_SESSION.get(CURRENT_WEATHER_URL, params=params, timeout=10)
         response.raise_for_status()
         data = response.json()
         
@@ -93,136 +141,157 @@ def fetch_current_weather():
         logging.error(f"Error fetching current weather: {e}")
         return None
 
-def fetch_historical_weather(days_back=5):
-    logging.info(f"Fetching historical weather data for last {days_back} days")
-    
-    historical_data = []
+def _fetch_historical_day(target_date):
+    """Fetch one past day's hourly records; runs on a worker thread"""
+    params = {
+        'lat': ATLANTA_LAT,
+        'lon': ATLANTA_LON,
+        'dt': int(target_date.timestamp()),
+        'appid': OPENWEATHER_API_KEY,
+        'units': 'metric'
+    }
     
-    for i in range(days_back):
-        target_date = datetime.now() - timedelta(days=i+1)
-        timestamp = int(target_date.timestamp())
+    try:
+        # 429s are retried by the session, waiting as long as Retry-After asks
+        response = HTTP_SESSION.get(HISTORICAL_WEATHER_URL, params=params, timeout=10)
+        response.raise_for_status()
+        data = response.json()
         
-        params = {
-            'lat': ATLANTA_LAT,
-            'lon': ATLANTA_LON,
-            'dt': timestamp,
-            'appid': OPENWEATHER_API_KEY,
-            'units': 'metric'
-        }
+        # Process hourly data
+        day_data = []
+        for hour_data in data.get('hourly', []):
+            weather_data = {
+                'timestamp': datetime.fromtimestamp(hour_data['dt']),
+                'temperature_celsius': hour_data['temp'],
+                'feels_like_celsius': hour_data['feels_like'],
+                'humidity': hour_data['humidity'],
+                'pressure_hpa': hour_data['pressure'],
+                'wind_speed_mps': hour_data['wind_speed'],
+                'wind_direction_degrees': hour_data.get('wind_deg'),
+                'weather_condition': hour_data['weather'][0]['main'],
+                'weather_description': hour_data['weather'][0]['description'],
+                'precipitation_mm': hour_data.get('rain', {}).get('1h', 0),
+                'visibility_meters': hour_data.get('visibility'),
+                'cloudiness_percent': hour_data['clouds']
+            }
+            day_data.append(weather_data)
+        return day_data
         
-        try:
-            response = requests.get(HISTORICAL_WEATHER_URL, params=params, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            
-            # Process hourly data
-            for hour_data in data.get('hourly', []):
-                weather_data = {
-                    'timestamp': datetime.fromtimestamp(hour_data['dt']),
-                    'temperature_celsius': hour_data['temp'],
-                    'feels_like_celsius': hour_data['feels_like'],
-                    'humidity': hour_data['humidity'],
-                    'pressure_hpa': hour_data['pressure'],
-                    'wind_speed_mps': hour_data['wind_speed'],
-                    'wind_direction_degrees': hour_data.get('wind_deg'),
-                    'weather_condition': hour_data['weather'][0]['main'],
-                    'weather_description': hour_data['weather'][0]['description'],
-                    'precipitation_mm': hour_data.get('rain', {}).get('1h', 0),
-                    'visibility_meters': hour_data.get('visibility'),
-                    'cloudiness_percent': hour_data['clouds']
-                }
-                historical_data.append(weather_data)
-            
-            # Rate limiting
-            time.sleep(1)
-            
-        except Exception as e:
-            logging.error(f"Error fetching historical weather for {target_date.date()}: {e}")
+    except Exception as e:
+        logging.error(f"Error fetching historical weather for {target_date.date()}: {e}")
+        return []
+
+async def fetch_historical_weather_async(days_back=5, stored_dates=frozenset()):
+    """Fetch the last ``days_back`` days, skipping dates already in ``stored_dates``"""
+    logging.info(f"Fetching historical weather data for last {days_back} days")
+    
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(HISTORICAL_FETCH_CONCURRENCY)
+    interval = 60 / HISTORICAL_REQUESTS_PER_MINUTE
+    next_start = loop.time()
+    
+    async def fetch_day(target_date):
+        nonlocal next_start
+        # Past days never change, so a day stored by an earlier run is not requested again
+        if target_date.date() in stored_dates:
+            return []
+        # Reserve the next start slot before waiting, so request starts stay evenly spaced
+        start_at = max(next_start, loop.time())
+        next_start = start_at + interval
+        await asyncio.sleep(start_at - loop.time())
+        async with semaphore:
+            return await loop.run_in_executor(FETCH_EXECUTOR, _fetch_historical_day, target_date)
+    
+    now = datetime.now()
+    days = await asyncio.gather(*(fetch_day(now - timedelta(days=i+1)) for i in range(days_back)))
+    historical_data = [record for day_data in days for record in day_data]
     
     logging.info(f"Fetched {len(historical_data)} historical weather records")
     return historical_data
 
+def fetch_historical_weather(days_back=5, stored_dates=frozenset()):
+    return asyncio.run(fetch_historical_weather_async(days_back, stored_dates))
+
+async def fetch_current_weather_async():
+    return await asyncio.get_running_loop().run_in_executor(FETCH_EXECUTOR, fetch_current_weather)
+
+async def fetch_all_weather_async(days_back=5, stored_dates=frozenset()):
+    """Fetch current and historical weather side by side"""
+    async with asyncio.TaskGroup() as tg:
+        current_task = tg.create_task(fetch_current_weather_async())
+        historical_task = tg.create_task(fetch_historical_weather_async(days_back, stored_dates))
+    return current_task.result(), historical_task.result()
+
 def store_weather_data(conn, weather_data_list):
     if not weather_data_list:
         return
     
+    # One row per timestamp: an upsert cannot touch the same row twice in one statement
+    rows = {
+        weather_data['timestamp']: tuple(weather_data[col] for col in WEATHER_COLUMNS)
+        for weather_data in weather_data_list
+    }
     with conn.cursor() as cursor:
-        for weather_data in weather_data_list:
-            cursor.execute(f'''
-                INSERT INTO {WEATHER_TABLE} (
-                    timestamp, temperature_celsius, feels_like_celsius, humidity, 
-                    pressure_hpa, wind_speed_mps, wind_direction_degrees, 
-                    weather_condition, weather_description, precipitation_mm, 
-                    visibility_meters, cloudiness_percent
-                )
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                ON CONFLICT (timestamp) DO UPDATE SET
-                    temperature_celsius = EXCLUDED.temperature_celsius,
-                    feels_like_celsius = EXCLUDED.feels_like_celsius,
-                    humidity = EXCLUDED.humidity,
-                    pressure_hpa = EXCLUDED.pressure_hpa,
-                    wind_speed_mps = EXCLUDED.wind_speed_mps,
-                    wind_direction_degrees = EXCLUDED.wind_direction_degrees,
-                    weather_condition = EXCLUDED.weather_condition,
-                    weather_description = EXCLUDED.weather_description,
-                    precipitation_mm = EXCLUDED.precipitation_mm,
-                    visibility_meters = EXCLUDED.visibility_meters,
-                    cloudiness_percent = EXCLUDED.cloudiness_percent,
-                    created_at = CURRENT_TIMESTAMP;
-            ''', (
-                weather_data['timestamp'],
-                weather_data['temperature_celsius'],
-                weather_data['feels_like_celsius'],
-                weather_data['humidity'],
-                weather_data['pressure_hpa'],
-                weather_data['wind_speed_mps'],
-                weather_data['wind_direction_degrees'],
-                weather_data['weather_condition'],
-                weather_data['weather_description'],
-                weather_data['precipitation_mm'],
-                weather_data['visibility_meters'],
-                weather_data['cloudiness_percent']
-            ))
+        extras.execute_values(
+            cursor, UPSERT_WEATHER_SQL, list(rows.values()),
+            template=WEATHER_ROW_TEMPLATE, page_size=1000
+        )
         conn.commit()
-        logging.info(f"Inserted/updated {len(weather_data_list)} weather records.")
+        logging.info(f"Inserted/updated {len(rows)} weather records.")
 
-def save_to_csv(weather_data_list):
-    if not weather_data_list:
-        return
+def save_to_csv(conn, days_back=5):
+    """Export the stored records of the last ``days_back`` days and today
     
-    df = pd.DataFrame(weather_data_list)
+    The export is read back from the table, so days skipped because an earlier
+    run already stored them are still written out.
+    """
+    export_sql = f"""
+        COPY (
+            SELECT {', '.join(WEATHER_COLUMNS)} FROM {WEATHER_TABLE}
+            WHERE timestamp >= CURRENT_DATE - {int(days_back)}
+            ORDER BY timestamp
+        ) TO STDOUT WITH (FORMAT csv, HEADER)
+    """
     os.makedirs(os.path.dirname(OUTPUT_CSV), exist_ok=True)
-    df.to_csv(OUTPUT_CSV, index=False)
-    logging.info(f"Saved weather data to {OUTPUT_CSV}")
+    with conn.cursor() as cursor, open(OUTPUT_CSV, 'w', newline='') as f:
+        cursor.copy_expert(export_sql, f)
+        logging.info(f"Saved {cursor.rowcount} weather records to {OUTPUT_CSV}")
 
 def main():
     logging.info("Starting weather data ingestion")
     
-    # Fetch current weather
-    current_weather = fetch_current_weather()
-    
-    # Fetch historical weather
-    historical_weather = fetch_historical_weather(days_back=5)
-    
-    # Combine data
-    all_weather_data = []
-    if current_weather:
-        all_weather_data.append(current_weather)
-    all_weather_data.extend(historical_weather)
-    
-    if all_weather_data:
-        # Store in database
-        conn = create_db_connection()
+    conn = create_db_connection()
+    try:
         setup_weather_table(conn)
-        store_weather_data(conn, all_weather_data)
-        conn.close()
         
-        # Save to CSV
-        save_to_csv(all_weather_data)
+        # Each run is a fresh process, so the table itself records which past days are done
+        stored_dates = fetch_stored_weather_dates(conn, days_back=5)
+        if stored_dates:
+            logging.info(f"Skipping {len(stored_dates)} days already stored")
         
-        logging.info(f"Weather ingestion complete. Total records: {len(all_weather_data)}")
-    else:
-        logging.error("No weather data retrieved")
+        # Fetch current and historical weather concurrently
+        current_weather, historical_weather = asyncio.run(
+            fetch_all_weather_async(days_back=5, stored_dates=stored_dates)
+        )
+        
+        # Combine data
+        all_weather_data = []
+        if current_weather:
+            all_weather_data.append(current_weather)
+        all_weather_data.extend(historical_weather)
+        
+        if all_weather_data:
+            # Store in database
+            store_weather_data(conn, all_weather_data)
+            
+            # Save to CSV
+            save_to_csv(conn, days_back=5)
+            
+            logging.info(f"Weather ingestion complete. Total records: {len(all_weather_data)}")
+        else:
+            logging.error("No weather data retrieved")
+    finally:
+        conn.close()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -6,6 +6,7 @@ Creates comprehensive features for machine learning models
 import os
 import logging
 import psycopg2
+from psycopg2 import extras
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
@@ -228,13 +229,15 @@ def create_lag_features(df: pd.DataFrame) -> pd.DataFrame:
     df = df.sort_values(['stop_id', 'timestamp'])
     
     # Lag features for dwell time
-    df['lag_dwell_time_1hr'] = df.groupby('stop_id')['inferred_dwell_time_seconds'].shift(1)
-    df['lag_dwell_time_24hr'] = df.groupby('stop_id')['inferred_dwell_time_seconds'].shift(24)
-    df['lag_dwell_time_7days'] = df.groupby('stop_id')['inferred_dwell_time_seconds'].shift(24*7)
+    dwell = df.groupby('stop_id', sort=False)['inferred_dwell_time_seconds']
+    df['lag_dwell_time_1hr'] = dwell.shift(1)
+    df['lag_dwell_time_24hr'] = dwell.shift(24)
+    df['lag_dwell_time_7days'] = dwell.shift(24*7)
     
     # Lag features for demand level
-    df['lag_demand_level_1hr'] = df.groupby('stop_id')['inferred_demand_level'].shift(1)
-    df['lag_demand_level_24hr'] = df.groupby('stop_id')['inferred_demand_level'].shift(24)
+    demand = df.groupby('stop_id', sort=False)['inferred_demand_level']
+    df['lag_demand_level_1hr'] = demand.shift(1)
+    df['lag_demand_level_24hr'] = demand.shift(24)
     
     return df
 
@@ -245,24 +248,21 @@ def create_rolling_features(df: pd.DataFrame) -> pd.DataFrame:
     # Sort by stop_id and timestamp
     df = df.sort_values(['stop_id', 'timestamp'])
     
-    # Rolling averages
-    df['rolling_avg_dwell_time_3hr'] = df.groupby('stop_id')['inferred_dwell_time_seconds'].transform(
-        lambda x: x.rolling(window=3, min_periods=1).mean().shift(1)
-    )
-    df['rolling_avg_dwell_time_24hr'] = df.groupby('stop_id')['inferred_dwell_time_seconds'].transform(
-        lambda x: x.rolling(window=24, min_periods=1).mean().shift(1)
-    )
+    dwell = df.groupby('stop_id', sort=False)['inferred_dwell_time_seconds']
     
-    # Rolling statistics
-    df['rolling_std_dwell_time_3hr'] = df.groupby('stop_id')['inferred_dwell_time_seconds'].transform(
-        lambda x: x.rolling(window=3, min_periods=1).std().shift(1)
-    )
-    df['rolling_max_dwell_time_3hr'] = df.groupby('stop_id')['inferred_dwell_time_seconds'].transform(
-        lambda x: x.rolling(window=3, min_periods=1).max().shift(1)
-    )
-    df['rolling_min_dwell_time_3hr'] = df.groupby('stop_id')['inferred_dwell_time_seconds'].transform(
-        lambda x: x.rolling(window=3, min_periods=1).min().shift(1)
-    )
+    def rolling_stats(window: int, stats: List[str]) -> pd.DataFrame:
+        # One windowed pass per window size, shifted so each row only sees prior readings
+        rolled = dwell.rolling(window=window, min_periods=1).agg(stats)
+        rolled = rolled.reset_index(level=0, drop=True)
+        return rolled.groupby(df['stop_id'], sort=False).shift(1)
+    
+    # Rolling averages and statistics
+    stats_3hr = rolling_stats(3, ['mean', 'std', 'max', 'min'])
+    df['rolling_avg_dwell_time_3hr'] = stats_3hr['mean']
+    df['rolling_avg_dwell_time_24hr'] = rolling_stats(24, ['mean'])['mean']
+    df['rolling_std_dwell_time_3hr'] = stats_3hr['std']
+    df['rolling_max_dwell_time_3hr'] = stats_3hr['max']
+    df['rolling_min_dwell_time_3hr'] = stats_3hr['min']
     
     return df
 
@@ -365,24 +365,15 @@ def store_features(conn, df: pd.DataFrame):
         if col not in df.columns:
             df[col] = None
     
+    # itertuples yields plain tuples without boxing each row into a Series
+    rows = list(df[feature_columns].itertuples(index=False, name=None))
+    
     with conn.cursor() as cursor:
-        for _, record in df[feature_columns].iterrows():
-            cursor.execute(f'''
-                INSERT INTO {FEATURE_TABLE} (
-                    timestamp, stop_id, route_id, trip_id,
-                    target_demand_level, target_dwell_time_seconds,
-                    trip_duration_minutes, trip_distance_km, delay_minutes, realized_vs_scheduled_time_diff,
-                    stop_sequence, zone_id, nearby_pois_count, historical_dwell_time_avg, historical_headway_avg,
-                    weather_condition, temperature_celsius, precipitation_mm, event_flag,
-                    day_of_week, hour_of_day, is_weekend, is_holiday, month, day_of_month,
-                    sin_hour_of_day, cos_hour_of_day, sin_day_of_week, cos_day_of_week, sin_month, cos_month,
-                    lag_dwell_time_1hr, lag_dwell_time_24hr, lag_dwell_time_7days, lag_demand_level_1hr, lag_demand_level_24hr,
-                    rolling_avg_dwell_time_3hr, rolling_avg_dwell_time_24hr, rolling_std_dwell_time_3hr,
-                    rolling_max_dwell_time_3hr, rolling_min_dwell_time_3hr,
-                    route_type, route_frequency_avg, route_delay_avg,
-                    stop_demand_level_avg, stop_delay_avg, stop_headway_avg
-                )
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        extras.execute_values(
+            cursor,
+            f'''
+                INSERT INTO {FEATURE_TABLE} ({', '.join(feature_columns)})
+                VALUES %s
                 ON CONFLICT (stop_id, timestamp) DO UPDATE SET
                     target_demand_level = EXCLUDED.target_demand_level,
                     target_dwell_time_seconds = EXCLUDED.target_dwell_time_seconds,
@@ -391,10 +382,13 @@ def store_features(conn, df: pd.DataFrame):
                     weather_condition = EXCLUDED.weather_condition,
                     temperature_celsius = EXCLUDED.temperature_celsius,
                     event_flag = EXCLUDED.event_flag
-            ''', tuple(record.values))
-        
-        conn.commit()
-        logging.info("Features stored successfully")
+            ''',
+            rows,
+            page_size=10000
+        )
+    
+    conn.commit()
+    logging.info("Features stored successfully")
 
 def generate_feature_summary(df: pd.DataFrame) -> Dict:
     """Generate summary of engineered features"""
@@ -3,12 +3,12 @@ Data Quality Monitoring Module
 Monitors data quality, model performance, and system health
 """
 import logging
-import requests
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 import psycopg2
 
 from config.settings import settings
+from src.data_ingestion.common import make_http_session
 
 logger = logging.getLogger(__name__)
 
@@ -19,6 +19,10 @@ class DataQualityMonitor:
     def __init__(self, alert_webhook_url: str = None):
         self.alert_webhook_url = alert_webhook_url or settings.ALERT_WEBHOOK_URL
         self.logger = logging.getLogger(__name__)
+        
+        # Keep-alive session for health probes and webhook alerts; no retries,
+        # so a probe reports what the API actually answered
+        self.session = make_http_session(pool_connections=4, pool_maxsize=10, retries=0)
     
     def check_gtfs_rt_freshness(self, last_update_time: datetime) -> bool:
         """Check if GTFS-RT data is fresh (< 90 seconds old)"""
@@ -69,7 +73,7 @@ class DataQualityMonitor:
     def check_api_health(self, api_url: str) -> bool:
         """Check if external API is responding"""
         try:
-            response = requests.get(api_url, timeout=10)
+            response = self.session.get(api_url, timeout=10)
             if response.status_code != 200:
                 self._send_alert(f"API {api_url} returned status {response.status_code}", "MEDIUM")
                 return False
@@ -91,7 +95,7 @@ class DataQualityMonitor:
         
         if self.alert_webhook_url:
             try:
-                requests.post(self.alert_webhook_url, json=alert, timeout=5)
+                self.session.post(self.alert_webhook_url, json=alert, timeout=5)
             except Exception as e:
                 self.logger.error(f"Failed to send webhook alert: {e}")
     
@@ -0,0 +1,83 @@
+"""
+Tests for the vectorized demo data generation
+"""
+import pytest
+import os
+import sys
+
+import pandas as pd
+
+# Add the repository root to path for imports
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+
+class TestDemoUnifiedDays:
+    """Test the demo unified rows generated per day"""
+
+    @pytest.fixture
+    def ingestion(self):
+        """Create a demo ingestion instance with the configured seed"""
+        pytest.importorskip("psycopg2")
+        pytest.importorskip("pydantic_settings")
+        from src.data_ingestion.simple_gtfs_ingestion import SimpleGTFSIngestion
+        return SimpleGTFSIngestion()
+
+    @pytest.fixture
+    def pairs_df(self):
+        """Trip/stop pairs with their stop coordinates"""
+        return pd.DataFrame({
+            'trip_id': ['TRIP_1', 'TRIP_1', 'TRIP_2', 'TRIP_3'],
+            'route_id': ['ROUTE_1', 'ROUTE_1', 'ROUTE_2', 'ROUTE_2'],
+            'stop_id': ['STOP_A', 'STOP_B', 'STOP_A', 'STOP_C'],
+            'stop_lat': [33.75, 33.76, 33.75, 33.77],
+            'stop_lon': [-84.39, -84.38, -84.39, -84.37],
+        })
+
+    def test_shapes_and_dtypes(self, ingestion, pairs_df):
+        """Test one frame per 24 hours with the expected columns and dtypes"""
+        from src.data_ingestion.simple_gtfs_ingestion import DEMO_UNIFIED_COLUMNS
+
+        hours = pd.date_range('2024-03-01', periods=60, freq='h')
+        days = list(ingestion._iter_demo_unified_days(pairs_df, hours))
+
+        assert [len(day) for day in days] == [24 * 4, 24 * 4, 12 * 4]
+        for day in days:
+            assert list(day.columns) == DEMO_UNIFIED_COLUMNS
+            assert pd.api.types.is_datetime64_any_dtype(day['timestamp'])
+            assert pd.api.types.is_datetime64_any_dtype(day['actual_arrival_time'])
+            assert pd.api.types.is_integer_dtype(day['inferred_dwell_time_seconds'])
+            assert pd.api.types.is_float_dtype(day['delay_minutes'])
+            assert day['event_flag'].dtype == bool
+            assert day['is_weekend'].dtype == bool
+            assert day['vehicle_id'].str.fullmatch(r'VEH_\d{4}').all()
+
+        # Hours vary slowest, then the trip/stop pairs in their given order
+        first_day = days[0]
+        assert (first_day['timestamp'].iloc[:4] == hours[0]).all()
+        assert list(first_day['stop_id'].iloc[:4]) == list(pairs_df['stop_id'])
+        assert (first_day['hour_of_day'].to_numpy() == first_day['timestamp'].dt.hour.to_numpy()).all()
+
+    def test_demand_level_thresholds(self, ingestion, pairs_df):
+        """Test demand levels follow the dwell-time thresholds"""
+        hours = pd.date_range('2024-03-01', periods=24 * 7, freq='h')
+        week = pd.concat(ingestion._iter_demo_unified_days(pairs_df, hours), ignore_index=True)
+        dwell = week['inferred_dwell_time_seconds']
+        level = week['inferred_demand_level']
+
+        assert (dwell >= 30).all()
+        assert (level[dwell <= 30] == 'Low').all()
+        assert (level[(dwell > 30) & (dwell <= 60)] == 'Normal').all()
+        assert (level[(dwell > 60) & (dwell <= 120)] == 'High').all()
+        assert (level[dwell > 120] == 'Overloaded').all()
+
+        # Rush hours average a 70 second dwell, off-peak weekdays 40 seconds
+        rush = week['hour_of_day'].isin([7, 8, 9, 17, 18, 19])
+        weekday = ~week['is_weekend']
+        assert (level[rush] == 'High').mean() > 0.5
+        assert (level[~rush & weekday] == 'Normal').mean() > 0.5
+        assert 0.01 < week['event_flag'].mean() < 0.1
+        assert set(week['weather_condition']) <= {'Clear', 'Cloudy', 'Rainy', 'Sunny'}
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,80 @@
+"""
+Tests for the grouped lag and rolling window features
+"""
+import pytest
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+# Add the repository root to path for imports
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def _reference_lag_and_rolling(df):
+    """Per-group transform lambdas the vectorized feature functions replaced"""
+    df = df.sort_values(['stop_id', 'timestamp'])
+    dwell = df.groupby('stop_id')['inferred_dwell_time_seconds']
+    demand = df.groupby('stop_id')['inferred_demand_level']
+    expected = pd.DataFrame(index=df.index)
+    expected['lag_dwell_time_1hr'] = dwell.shift(1)
+    expected['lag_dwell_time_24hr'] = dwell.shift(24)
+    expected['lag_dwell_time_7days'] = dwell.shift(24*7)
+    expected['lag_demand_level_1hr'] = demand.shift(1)
+    expected['lag_demand_level_24hr'] = demand.shift(24)
+    for column, window, stat in [
+        ('rolling_avg_dwell_time_3hr', 3, 'mean'),
+        ('rolling_avg_dwell_time_24hr', 24, 'mean'),
+        ('rolling_std_dwell_time_3hr', 3, 'std'),
+        ('rolling_max_dwell_time_3hr', 3, 'max'),
+        ('rolling_min_dwell_time_3hr', 3, 'min'),
+    ]:
+        expected[column] = dwell.transform(
+            lambda x: getattr(x.rolling(window=window, min_periods=1), stat)().shift(1)
+        )
+    return expected
+
+
+class TestLagAndRollingFeatures:
+    """Test the grouped lag and rolling features against the per-group reference"""
+
+    @pytest.fixture
+    def readings(self):
+        """Shuffled hourly readings for several stops, with missing dwell times"""
+        # The feature module itself imports the database driver and scikit-learn
+        pytest.importorskip("psycopg2")
+        pytest.importorskip("sklearn")
+        rng = np.random.default_rng(0)
+        n = 2000
+        return pd.DataFrame({
+            'stop_id': rng.choice([f'STOP_{i}' for i in range(12)], n),
+            'timestamp': pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.permutation(n), unit='h'),
+            'inferred_dwell_time_seconds': np.where(rng.random(n) < 0.1, np.nan, rng.normal(60, 20, n)),
+            'inferred_demand_level': rng.choice(['Low', 'Normal', 'High', 'Overloaded'], n),
+        })
+
+    def test_matches_per_group_reference(self, readings):
+        """Test lag and rolling columns equal the per-group transform output"""
+        from src.data_processing.feature_engineering import create_lag_features, create_rolling_features
+
+        features = create_rolling_features(create_lag_features(readings.copy()))
+        expected = _reference_lag_and_rolling(readings)
+
+        assert list(features.index) == list(expected.index)
+        for column in expected.columns:
+            pd.testing.assert_series_equal(features[column], expected[column], check_names=False)
+
+    def test_first_reading_per_stop_has_no_history(self, readings):
+        """Test each stop's earliest row sees no prior readings"""
+        from src.data_processing.feature_engineering import create_lag_features, create_rolling_features
+
+        features = create_rolling_features(create_lag_features(readings.copy()))
+        first_rows = features.groupby('stop_id').head(1)
+
+        assert first_rows['lag_dwell_time_1hr'].isna().all()
+        assert first_rows['rolling_avg_dwell_time_3hr'].isna().all()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,145 @@
+"""
+Tests for the daily partitioning of the GTFS-Realtime tables
+"""
+import pytest
+import os
+import sys
+from datetime import date
+from unittest.mock import MagicMock
+
+# Add the repository root to path for imports
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+
+@pytest.fixture
+def ingestion():
+    """The GTFS-Realtime ingestion module"""
+    pytest.importorskip("psycopg2")
+    pytest.importorskip("requests")
+    pytest.importorskip("google.transit.gtfs_realtime_pb2")
+    from src.data_ingestion import gtfs_realtime_ingestion
+    return gtfs_realtime_ingestion
+
+
+class _ScriptedCursor:
+    """Cursor that records statements and answers catalog lookups from a set of relations"""
+
+    def __init__(self, existing=(), partitioned=()):
+        self.existing = set(existing)
+        self.partitioned = set(partitioned)
+        self.statements = []
+        self.rowcount = 0
+        self._result = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        sql = ' '.join(sql.split())
+        self.statements.append((sql, params))
+        self.rowcount = 0
+        if sql.startswith("SELECT to_regclass"):
+            self._result = (params[0] in self.existing,)
+        elif "pg_partitioned_table" in sql:
+            self._result = (1,) if params[0] in self.partitioned else None
+        elif sql.startswith("WITH moved"):
+            self.rowcount = 3
+
+    def fetchone(self):
+        return self._result
+
+    def sql(self):
+        return [sql for sql, _ in self.statements]
+
+
+class TestMigrateUnpartitionedTable:
+    """Test the one-off rebuild of plain realtime tables"""
+
+    def test_missing_table_is_left_to_create(self, ingestion):
+        """Test nothing is migrated when the table does not exist yet"""
+        cursor = _ScriptedCursor()
+
+        ingestion.migrate_unpartitioned_table(cursor, 'gtfs_vehicle_positions', 'CREATE ...')
+
+        assert len(cursor.statements) == 1
+
+    def test_partitioned_table_is_untouched(self, ingestion):
+        """Test an already partitioned table is not rebuilt"""
+        cursor = _ScriptedCursor(existing={'gtfs_vehicle_positions'}, partitioned={'gtfs_vehicle_positions'})
+
+        ingestion.migrate_unpartitioned_table(cursor, 'gtfs_vehicle_positions', 'CREATE ...')
+
+        assert not any(sql.startswith(("ALTER", "CREATE", "INSERT", "DROP")) for sql in cursor.sql())
+
+    def test_plain_table_is_rebuilt_with_its_rows(self, ingestion):
+        """Test a plain table is renamed, recreated partitioned, refilled and dropped"""
+        cursor = _ScriptedCursor(existing={'gtfs_vehicle_positions'})
+
+        ingestion.migrate_unpartitioned_table(
+            cursor, 'gtfs_vehicle_positions', ingestion.CREATE_VEHICLE_POSITIONS_TABLE
+        )
+
+        assert cursor.sql()[2:] == [
+            "ALTER TABLE gtfs_vehicle_positions RENAME TO gtfs_vehicle_positions_unpartitioned",
+            ' '.join(ingestion.CREATE_VEHICLE_POSITIONS_TABLE.split()),
+            "CREATE TABLE gtfs_vehicle_positions_default PARTITION OF gtfs_vehicle_positions DEFAULT",
+            "INSERT INTO gtfs_vehicle_positions SELECT * FROM gtfs_vehicle_positions_unpartitioned",
+            "DROP TABLE gtfs_vehicle_positions_unpartitioned",
+        ]
+
+
+class TestEnsureDailyPartitions:
+    """Test the per-day partitions created around the current day"""
+
+    def _conn(self, cursor):
+        conn = MagicMock()
+        conn.cursor.return_value = cursor
+        return conn
+
+    def test_creates_fills_and_attaches_missing_partitions(self, ingestion):
+        """Test each missing day is built, drained from the default partition, then attached"""
+        cursor = _ScriptedCursor()
+        conn = self._conn(cursor)
+
+        ingestion.ensure_daily_partitions(conn, date(2024, 3, 1))
+
+        for table in ingestion.PARTITIONED_TABLES:
+            for start, end in [('20240229', '2024-03-01'), ('20240301', '2024-03-02'), ('20240302', '2024-03-03')]:
+                partition = f"{table}_{start}"
+                statements = [sql for sql in cursor.sql() if partition in sql]
+                assert statements[0] == f"CREATE TABLE {partition} (LIKE {table} INCLUDING DEFAULTS)"
+                assert statements[1].startswith(f"WITH moved AS ( DELETE FROM {table}_default")
+                assert statements[2].startswith(f"ALTER TABLE {table} ATTACH PARTITION {partition}")
+                assert statements[2].endswith(f"TO ('{end}')")
+        conn.commit.assert_called_once()
+
+    def test_moves_only_the_partition_day(self, ingestion):
+        """Test rows are moved out of the default partition for exactly the partition's day"""
+        cursor = _ScriptedCursor()
+
+        ingestion.ensure_daily_partitions(self._conn(cursor), date(2024, 3, 1))
+
+        moves = [params for sql, params in cursor.statements if sql.startswith("WITH moved")]
+        assert len(moves) == 3 * len(ingestion.PARTITIONED_TABLES)
+        assert all((end - start).days == 1 for start, end in moves)
+        assert {start for start, _ in moves} == {date(2024, 2, 29), date(2024, 3, 1), date(2024, 3, 2)}
+
+    def test_existing_partitions_are_skipped(self, ingestion):
+        """Test partitions that already exist are neither recreated nor reattached"""
+        existing = {f"{table}_20240301" for table in ingestion.PARTITIONED_TABLES}
+        cursor = _ScriptedCursor(existing=existing)
+
+        ingestion.ensure_daily_partitions(self._conn(cursor), date(2024, 3, 1))
+
+        for partition in existing:
+            assert not any(
+                sql.startswith(("CREATE", "WITH", "ALTER")) and partition in sql for sql in cursor.sql()
+            )
+        assert sum(sql.startswith("ALTER TABLE") for sql in cursor.sql()) == 2 * len(ingestion.PARTITIONED_TABLES)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,78 @@
+"""
+Tests for the vectorized synthetic real-time data simulation
+"""
+import pytest
+import os
+import sys
+from unittest.mock import patch
+
+import pandas as pd
+
+# Add the repository root to path for imports
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+
+class TestSyntheticRealtimeDays:
+    """Test the synthetic real-time records simulated per day"""
+
+    @pytest.fixture
+    def processor(self):
+        """Create a processor without touching the database"""
+        pytest.importorskip("psycopg2")
+        pytest.importorskip("pydantic_settings")
+        pytest.importorskip("requests")
+        pytest.importorskip("google.transit.gtfs_realtime_pb2")
+        from src.data_ingestion.gtfs_realtime_processor import GTFSRealtimeProcessor
+        with patch.object(GTFSRealtimeProcessor, 'create_unified_table'):
+            return GTFSRealtimeProcessor()
+
+    @pytest.fixture
+    def merged_df(self):
+        """A stop_times/trips/stops join including a past-midnight and an unparseable time"""
+        return pd.DataFrame({
+            'trip_id': ['TRIP_1', 'TRIP_1', 'TRIP_2', 'TRIP_2', 'TRIP_3'],
+            'route_id': ['ROUTE_1', 'ROUTE_1', 'ROUTE_2', 'ROUTE_2', 'ROUTE_2'],
+            'stop_id': ['STOP_A', 'STOP_B', 'STOP_A', 'STOP_C', 'STOP_D'],
+            'stop_sequence': [1, 2, 1, 2, 1],
+            'stop_lat': ['33.75', '33.76', '33.75', '33.77', '33.78'],
+            'stop_lon': ['-84.39', '-84.38', '-84.39', '-84.37', '-84.36'],
+            'arrival_time': ['08:00:00', '08:05:00', '17:30:00', '25:10:00', 'not a time'],
+            'departure_time': ['08:00:30', '08:06:00', '17:31:00', '25:11:00', 'not a time'],
+        }, index=[10, 11, 12, 13, 14])
+
+    def test_shapes_and_dtypes(self, processor, merged_df):
+        """Test one frame per day over the valid schedule rows"""
+        days = list(processor.iter_synthetic_realtime_days(merged_df, num_days=3))
+
+        assert len(days) == 3
+        for day in days:
+            assert list(day.index) == [10, 11, 12, 13]
+            assert pd.api.types.is_datetime64_any_dtype(day['scheduled_arrival_time'])
+            assert pd.api.types.is_datetime64_any_dtype(day['actual_departure_time'])
+            assert pd.api.types.is_float_dtype(day['latitude'])
+            assert pd.api.types.is_float_dtype(day['inferred_dwell_time_seconds'])
+            assert day['event_flag'].dtype == bool
+            assert (day['actual_arrival_time'] >= day['scheduled_arrival_time']).all()
+            assert (day['actual_departure_time'] >= day['scheduled_departure_time']).all()
+            assert (day['inferred_dwell_time_seconds'] >= 0).all()
+            assert (day['precipitation_mm'][day['weather_condition'] != 'Rainy'] == 0).all()
+
+        # Consecutive simulated days, with times past 24:00:00 rolling into the next date
+        first_day = days[0]['scheduled_arrival_time']
+        assert (days[1]['scheduled_arrival_time'] - first_day == pd.Timedelta(days=1)).all()
+        assert first_day[13] - first_day[10] == pd.Timedelta(hours=17, minutes=10)
+
+    def test_demand_level_bins(self, processor, merged_df):
+        """Test demand levels follow the dwell-time bins"""
+        days = pd.concat(processor.iter_synthetic_realtime_days(merged_df, num_days=50))
+        dwell = days['inferred_dwell_time_seconds']
+        level = days['inferred_demand_level'].astype(str)
+
+        assert (level[dwell <= 30] == 'Low').all()
+        assert (level[(dwell > 30) & (dwell <= 60)] == 'Normal').all()
+        assert (level[(dwell > 60) & (dwell <= 120)] == 'High').all()
+        assert (level[dwell > 120] == 'Overloaded').all()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
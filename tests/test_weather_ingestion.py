@@ -0,0 +1,109 @@
+"""
+Tests for weather ingestion: batched storage and historical fetch pacing
+"""
+import pytest
+import os
+import sys
+import asyncio
+from concurrent.futures import Executor, Future
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pandas as pd
+
+# Add the repository root to path for imports
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+
+@pytest.fixture
+def weather():
+    """The weather fetcher module"""
+    pytest.importorskip("psycopg2")
+    pytest.importorskip("requests")
+    from src.data_ingestion import weather_data_fetcher
+    return weather_data_fetcher
+
+
+class TestStoreWeatherData:
+    """Test the batched weather upsert"""
+
+    def _record(self, weather, timestamp, temperature):
+        record = {col: None for col in weather.WEATHER_COLUMNS}
+        record.update({'timestamp': timestamp, 'temperature_celsius': temperature})
+        return record
+
+    def test_dedups_by_timestamp(self, weather):
+        """Test one upsert row per timestamp, keeping the last reading"""
+        first_hour = datetime(2024, 3, 1, 8)
+        second_hour = datetime(2024, 3, 1, 9)
+        records = [
+            self._record(weather, first_hour, 10.0),
+            self._record(weather, second_hour, 11.0),
+            self._record(weather, first_hour, 12.5),
+        ]
+        conn = MagicMock()
+
+        with patch.object(weather.extras, 'execute_values') as mock_execute_values:
+            weather.store_weather_data(conn, records)
+
+        rows = mock_execute_values.call_args[0][2]
+        temperature = weather.WEATHER_COLUMNS.index('temperature_celsius')
+        assert len(rows) == 2
+        assert {row[0]: row[temperature] for row in rows} == {first_hour: 12.5, second_hour: 11.0}
+        conn.commit.assert_called_once()
+
+    def test_skips_empty_batch(self, weather):
+        """Test an empty batch never reaches the database"""
+        conn = MagicMock()
+
+        with patch.object(weather.extras, 'execute_values') as mock_execute_values:
+            weather.store_weather_data(conn, [])
+
+        mock_execute_values.assert_not_called()
+        conn.cursor.assert_not_called()
+
+
+class _RecordingExecutor(Executor):
+    """Executor that runs nothing, recording when each job was handed to it"""
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.submitted = []
+
+    def submit(self, fn, *args, **kwargs):
+        self.submitted.append((self.loop.time(), args))
+        future = Future()
+        future.set_result([{'timestamp': args[0]}])
+        return future
+
+
+class TestHistoricalFetchPacing:
+    """Test the paced historical weather fan-out"""
+
+    def test_spaces_request_starts(self, weather):
+        """Test request starts are spaced by the per-minute quota and stored days are skipped"""
+        interval = 60 / 600
+
+        async def run():
+            executor = _RecordingExecutor(asyncio.get_running_loop())
+            skipped = (datetime.now() - pd.Timedelta(days=2)).date()
+            with patch.object(weather, 'FETCH_EXECUTOR', executor), \
+                 patch.object(weather, 'HISTORICAL_REQUESTS_PER_MINUTE', 600):
+                records = await weather.fetch_historical_weather_async(days_back=6, stored_dates={skipped})
+            return executor.submitted, records, skipped
+
+        submitted, records, skipped = asyncio.run(run())
+
+        assert len(submitted) == 5
+        assert len(records) == 5
+        assert skipped not in {args[0].date() for _, args in submitted}
+        starts = [start for start, _ in submitted]
+        gaps = np.diff(starts)
+        assert (gaps >= interval * 0.9).all()
+        # The first request goes out immediately; the skipped day reserves no slot
+        assert starts[-1] - starts[0] < interval * 4 + 0.5
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])